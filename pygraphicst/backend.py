@@ -0,0 +1,361 @@
+import collections as _collections
+import curses as _curses
+import os as _os
+import select as _select
+import sys as _sys
+import time as _time
+import typing as _typing
+
+import pygraphicst.buffer as _buffer
+import pygraphicst.wcwidth as _wcwidth
+
+
+class Backend:
+    # whether the screen is a real terminal that gets SIGWINCH
+    tty = False
+
+    def initialize(self) -> None:
+        pass
+
+    def terminate(self) -> None:
+        pass
+
+    def clock(self) -> float:
+        return _time.monotonic()
+
+    @property
+    def xy_size(self) -> _typing.Tuple[int, int]:
+        return 0, 0
+
+    # next key or char, None if there is no pending input
+    def read(self):
+        return None
+
+    # (x, y, state) of the last KEY_MOUSE, None if it can't be read
+    def mouse(self) -> _typing.Optional[_typing.Tuple[int, int, int]]:
+        return None
+
+    # pick up a new terminal size before KEY_RESIZE is dispatched
+    def resize(self) -> None:
+        pass
+
+    # file descriptor to watch for input, None if there is none
+    def fileno(self) -> _typing.Optional[int]:
+        return None
+
+    # block until input, one of fds is readable or timeout seconds passed
+    def wait(self, fds, timeout: _typing.Optional[float]) -> None:
+        pass
+
+    def write(self, x, y, text: str, style: _buffer.Style) -> None:
+        pass
+
+    # x and y are -1 to hide the cursor
+    def cursor(self, x, y) -> None:
+        pass
+
+    # the screen is blank after the next update
+    def clear(self) -> None:
+        pass
+
+    def update(self) -> None:
+        pass
+
+    # true once after cells already on the screen may have changed colour, they have to be written again
+    def stale(self) -> bool:
+        return False
+
+
+_BASIC = (
+    (0, 0, 0), (205, 0, 0), (0, 205, 0), (205, 205, 0), (0, 0, 238), (205, 0, 205), (0, 205, 205), (229, 229, 229),
+    (127, 127, 127), (255, 0, 0), (0, 255, 0), (255, 255, 0), (92, 92, 255), (255, 0, 255), (0, 255, 255),
+    (255, 255, 255)
+)
+
+
+# rgb of the xterm palette
+def _palette(c) -> _typing.Tuple[int, int, int]:
+    if c < 16:
+        return _BASIC[c]
+    if c < 232:
+        c -= 16
+        return tuple(0 if i == 0 else 55 + i * 40 for i in (c // 36, c // 6 % 6, c % 6))
+    return (8 + (c - 232) * 10,) * 3
+
+
+# nearest of the first n palette colours to an rgb
+def _nearest(rgb, n) -> int:
+    if n >= 256:
+        # nearest in the 6x6x6 cube or on the gray ramp
+        cube = [min(range(6), key=lambda i: abs((55 + i * 40 if i else 0) - v)) for v in rgb]
+        gray = min(23, max(0, (sum(rgb) // 3 - 3) // 10))
+        candidates = [16 + cube[0] * 36 + cube[1] * 6 + cube[2], 232 + gray]
+    else:
+        candidates = range(n)
+    return min(candidates, key=lambda c: sum((a - b) ** 2 for a, b in zip(_palette(c), rgb)))
+
+
+class CursesBackend(Backend):
+    tty = True
+
+    def __init__(self):
+        self._window = None
+        # (color_f, color_b) -> pair, least recently used first, pairs are set up on first use
+        self._pairs: _typing.Dict[_typing.Tuple[int, int], int] = _collections.OrderedDict()
+        self._pairs_max = 0
+        self._colors = 0
+        self._resolved: _typing.Dict[int, int] = {}
+        # style -> (curses attribute, key of its pair), dropped when a pair is reused
+        self._attrs: _typing.Dict[_buffer.Style, _typing.Tuple[int, _typing.Tuple[int, int]]] = {}
+        self._stale = False
+
+    def initialize(self):
+        self._window = _curses.initscr()
+        self._window.keypad(True)
+        self._window.nodelay(True)
+        _curses.noecho()
+        _curses.cbreak()
+        _curses.mouseinterval(1)
+        _curses.mousemask(0 | _curses.BUTTON1_PRESSED | _curses.BUTTON1_RELEASED)
+        _curses.curs_set(0)
+
+        try:
+            _curses.start_color()
+            _curses.use_default_colors()
+            # addstr attributes only have room for 256 pairs, pair 0 is the default colours
+            self._pairs_max = min(_curses.COLOR_PAIRS, 256) - 1
+            self._colors = _curses.COLORS
+        except _curses.error:
+            pass
+        self._pairs.clear()
+        self._resolved.clear()
+        self._attrs.clear()
+
+    def terminate(self):
+        self._window.keypad(0)
+        _curses.echo()
+        _curses.nocbreak()
+        _curses.curs_set(1)
+        _curses.endwin()
+
+    # colours the terminal lacks become the nearest one it has
+    def _resolve(self, c):
+        if c < self._colors:
+            return c
+        r = self._resolved.get(c)
+        if r is None:
+            rgb = ((c >> 16) & 0xff, (c >> 8) & 0xff, c & 0xff) if c > 0xffffff else _palette(c)
+            r = self._resolved[c] = _nearest(rgb, self._colors)
+        return r
+
+    def _pair(self, fg, bg):
+        if self._pairs_max == 0:
+            return 0
+        k = (self._resolve(fg), self._resolve(bg))
+        n = self._pairs.get(k)
+        if n is not None:
+            self._pairs.move_to_end(k)
+            return n
+        if k == (-1, -1):
+            return 0
+        if len(self._pairs) < self._pairs_max:
+            n = len(self._pairs) + 1
+        else:
+            # reuse the least recently used pair, cells drawn with it change colour
+            _, n = self._pairs.popitem(last=False)
+            self._attrs.clear()
+            self._stale = True
+        try:
+            _curses.init_pair(n, *k)
+        except _curses.error:
+            pass
+        self._pairs[k] = n
+        return n
+
+    @property
+    def xy_size(self):
+        return self._window.getmaxyx()[::-1]
+
+    def read(self):
+        try:
+            return self._window.get_wch()
+        except _curses.error:
+            return None
+
+    def mouse(self):
+        try:
+            _, x, y, _, state = _curses.getmouse()
+            return x, y, state
+        except _curses.error:
+            return None
+
+    def resize(self):
+        x, y = _os.get_terminal_size(self.fileno())
+        _curses.resizeterm(y, x)
+
+    def fileno(self):
+        return _sys.stdin.fileno()
+
+    def wait(self, fds, timeout):
+        _select.select([self.fileno(), *fds], [], [], timeout)
+
+    def write(self, x, y, text, style):
+        a = self._attrs.get(style)
+        if a is None:
+            attr, color_f, color_b = style
+            n = self._pair(color_f, color_b)
+            # the pair just used is the last one
+            a = self._attrs[style] = (attr | _curses.color_pair(n), next(reversed(self._pairs)) if n != 0 else None)
+        elif a[1] is not None:
+            self._pairs.move_to_end(a[1])
+        try:
+            self._window.addstr(y, x, text, a[0])
+        except _curses.error:
+            pass
+
+    def cursor(self, x, y):
+        if x == -1 and y == -1:
+            _curses.curs_set(0)
+        else:
+            _curses.curs_set(1)
+            self._window.move(y, x)
+
+    def clear(self):
+        self._window.clear()
+
+    def update(self):
+        self._window.noutrefresh()
+        _curses.doupdate()
+
+    def stale(self):
+        s = self._stale
+        self._stale = False
+        return s
+
+
+# in-memory screen with scripted input and a fake clock, for tests and benchmarks
+class HeadlessBackend(Backend):
+    def __init__(self, x_size=80, y_size=24):
+        self.x_size = x_size
+        self.y_size = y_size
+        self.time = 0.0
+        self.cells: _typing.List[_typing.List[_typing.Tuple[str, _buffer.Style]]] = []
+        self.xy_cursor = (-1, -1)
+        self.writes = 0
+        self.updates = 0
+        # (time, event), event is a key, ('mouse', x, y, state) or ('resize', x, y)
+        self._events = _collections.deque()
+        self._mouse = None
+        # readable while events are queued, so serve_async wakes up for them
+        self._pipe = None
+        self._clear()
+
+    def initialize(self):
+        self._pipe = _os.pipe()
+        for i in self._pipe:
+            _os.set_blocking(i, False)
+
+    def terminate(self):
+        for i in self._pipe:
+            _os.close(i)
+        self._pipe = None
+
+    def fileno(self):
+        return None if self._pipe is None else self._pipe[0]
+
+    def _queue(self, e, delay):
+        self._events.append((self._at(delay), e))
+        if self._pipe is not None:
+            try:
+                _os.write(self._pipe[1], b'\0')
+            except (BlockingIOError, OSError):
+                pass
+
+    def _clear(self):
+        self.cells = [[(' ', _buffer.STYLE_DEFAULT)] * self.x_size for _ in range(self.y_size)]
+
+    def _at(self, delay):
+        t = self.time if len(self._events) == 0 else max(self.time, self._events[-1][0])
+        return t + delay
+
+    def feed(self, *keys, delay=0.0):
+        for i in keys:
+            self._queue(i, delay)
+
+    def click(self, x, y, state, delay=0.0):
+        self._queue(('mouse', x, y, state), delay)
+
+    def resize_to(self, x_size, y_size, delay=0.0):
+        self._queue(('resize', x_size, y_size), delay)
+
+    def clock(self):
+        return self.time
+
+    @property
+    def xy_size(self):
+        return self.x_size, self.y_size
+
+    # events delayed past the time are read by serve once it gets there, serve_async does not move the time
+    def read(self):
+        if len(self._events) == 0 or self._events[0][0] > self.time:
+            if self._pipe is not None:
+                try:
+                    while _os.read(self._pipe[0], 512):
+                        pass
+                except (BlockingIOError, OSError):
+                    pass
+            return None
+        _, e = self._events.popleft()
+        if isinstance(e, tuple):
+            if e[0] == 'mouse':
+                self._mouse = e[1:]
+                return _curses.KEY_MOUSE
+            elif e[0] == 'resize':
+                self.x_size, self.y_size = e[1:]
+                self._clear()
+                return _curses.KEY_RESIZE
+        return e
+
+    def mouse(self):
+        m = self._mouse
+        self._mouse = None
+        return m
+
+    def wait(self, fds, timeout):
+        if len(fds) > 0 and len(_select.select(fds, [], [], 0)[0]) > 0:
+            return
+        if len(self._events) > 0:
+            t = self._events[0][0]
+            self.time = max(self.time, t if timeout is None else min(t, self.time + timeout))
+        elif timeout is not None:
+            self.time += timeout
+        else:
+            raise RuntimeError('Headless backend is out of input.')
+
+    def write(self, x, y, text, style):
+        self.writes += 1
+        row = self.cells[y]
+        for c, w in zip(text, _wcwidth.widths(text)):
+            if w <= 0:
+                if x > 0 and w == 0:
+                    row[x - 1] = (row[x - 1][0] + c, style)
+            elif x + w > self.x_size:
+                break
+            else:
+                row[x] = (c, style)
+                for i in range(x + 1, x + w):
+                    row[i] = ('', style)
+                x += w
+
+    def cursor(self, x, y):
+        self.xy_cursor = (x, y)
+
+    def clear(self):
+        self._clear()
+
+    def update(self):
+        self.updates += 1
+
+    # screen content as text with trailing blanks stripped
+    def lines(self) -> _typing.List[str]:
+        return [''.join(c for c, _ in row).rstrip() for row in self.cells]
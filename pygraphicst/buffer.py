@@ -0,0 +1,147 @@
+import typing as _typing
+
+import pygraphicst.wcwidth as _wcwidth
+
+# (attr, color_f, color_b)
+Style = _typing.Tuple[int, int, int]
+_styles: _typing.Dict[Style, Style] = {}
+
+
+# the one shared tuple of a style, equal cells then compare by identity and backends can cache by it
+def style(attr=0, color_f=-1, color_b=-1) -> Style:
+    k = (attr, color_f, color_b)
+    s = _styles.get(k)
+    if s is None:
+        s = _styles[k] = k
+    return s
+
+
+STYLE_DEFAULT: Style = style()
+
+# a cell is (char, style), the right half of a wide char holds an empty char
+_BLANK = (' ', STYLE_DEFAULT)
+_UNKNOWN = (None, None)
+
+
+class Buffer:
+    def __init__(self, x_size=0, y_size=0):
+        self.x_size = self.y_size = 0
+        self._cells = []
+        self._shown = []
+        self._dirty = set()
+        # called on the first change after a flush
+        self.on_dirty: _typing.Optional[_typing.Callable[[], None]] = None
+        self.resize(x_size, y_size)
+
+    # the terminal is expected to be blank after this
+    def resize(self, x_size, y_size):
+        self.x_size = x_size
+        self.y_size = y_size
+        self._cells = [[_BLANK] * x_size for _ in range(y_size)]
+        self._shown = [[_BLANK] * x_size for _ in range(y_size)]
+        self._dirty.clear()
+
+    # forget what the terminal shows, next flush writes every cell
+    def invalidate(self):
+        self._shown = [[_UNKNOWN] * self.x_size for _ in range(self.y_size)]
+        self._dirty = set(range(self.y_size))
+
+    def _split(self, row, x):
+        # keep wide chars whole when a write starts or ends at x
+        if 0 < x < self.x_size and row[x][0] == '':
+            row[x - 1] = (' ', row[x - 1][1])
+            row[x] = (' ', row[x][1])
+
+    def put(self, x, y, s: str, style: Style = STYLE_DEFAULT):
+        if not 0 <= y < self.y_size or x >= self.x_size or len(s) == 0:
+            return
+        row = self._cells[y]
+
+        if _wcwidth.narrow(s):
+            if x < 0:
+                s = s[-x:]
+                x = 0
+            s = s[:self.x_size - x]
+            end = x + len(s)
+            self._split(row, x)
+            self._split(row, end)
+            row[x:end] = [(c, style) for c in s]
+        else:
+            ws = _wcwidth.widths(s)
+            # split where the written cells end before writing them, like above
+            end = x
+            for w in ws:
+                if w > 0:
+                    if end >= self.x_size:
+                        break
+                    end += w
+            self._split(row, max(x, 0))
+            self._split(row, end)
+            last = None
+            for c, w in zip(s, ws):
+                if w == 0:
+                    if last is not None:
+                        row[last] = (row[last][0] + c, style)
+                elif w > 0:
+                    if x >= self.x_size:
+                        break
+                    if x >= 0:
+                        if x + w > self.x_size:
+                            row[x] = (' ', style)
+                            last = None
+                        else:
+                            row[x] = (c, style)
+                            for i in range(x + 1, x + w):
+                                row[i] = ('', style)
+                            last = x
+                    elif x + w > 0:
+                        for i in range(0, x + w):
+                            row[i] = (' ', style)
+                    x += w
+
+        if len(self._dirty) == 0 and self.on_dirty is not None:
+            self.on_dirty()
+        self._dirty.add(y)
+
+    def fill(self, x, y, x_size, y_size, style: Style = STYLE_DEFAULT):
+        x_end = min(x + x_size, self.x_size)
+        x = max(x, 0)
+        if x >= x_end:
+            return
+        cells = [(' ', style)] * (x_end - x)
+        rows = range(max(y, 0), min(y + y_size, self.y_size))
+        if len(self._dirty) == 0 and len(rows) > 0 and self.on_dirty is not None:
+            self.on_dirty()
+        for i in rows:
+            row = self._cells[i]
+            self._split(row, x)
+            self._split(row, x_end)
+            row[x:x_end] = cells
+            self._dirty.add(i)
+
+    def get(self, x, y) -> _typing.Tuple[str, Style]:
+        return self._cells[y][x]
+
+    # write(y, x, text, style) is called for each changed run of same styled cells
+    def flush(self, write: _typing.Callable) -> int:
+        n = 0
+        for y in sorted(self._dirty):
+            row = self._cells[y]
+            shown = self._shown[y]
+            x = 0
+            while x < self.x_size:
+                if row[x] == shown[x]:
+                    x += 1
+                    continue
+                start = x
+                if row[start][0] == '':
+                    start -= 1
+                style = row[start][1]
+                x = start + 1
+                while x < self.x_size and row[x][1] == style and (row[x] != shown[x] or row[x][0] == ''):
+                    x += 1
+                write(y, start, ''.join([c for c, _ in row[start:x]]), style)
+                shown[start:x] = row[start:x]
+                n += 1
+        self._dirty.clear()
+        return n
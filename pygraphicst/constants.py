@@ -20,6 +20,11 @@ class Color:
     WEAK_CYAN = 14
     WEAK_WHITE = 15
 
+    # 0 to 255 are the xterm palette, terminals with less colours show the nearest one
+    @staticmethod
+    def rgb(r, g, b) -> int:
+        return 0x1000000 | r << 16 | g << 8 | b
+
 
 class Attibute:
     ALTCHARSET = curses.A_ALTCHARSET
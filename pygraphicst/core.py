@@ -1,16 +1,32 @@
+import asyncio as _asyncio
+import collections as _collections
+import concurrent.futures as _futures
 import curses as _curses
 import curses.ascii as _ascii
-import math as _math
+import functools as _functools
+import heapq as _heapq
+import inspect as _inspect
+import os as _os
 import re as _re
+import signal as _signal
+import threading as _threading
 import time as _time
 import typing as _typing
 from typing import Callable as _Callable
 from typing import Optional as _Optional
 
+import pygraphicst.backend as _backend
+import pygraphicst.buffer as _buffer
 import pygraphicst.constants as _constants
+import pygraphicst.document as _document
+import pygraphicst.profile as _profile
+import pygraphicst.scheduler as _scheduler
 import pygraphicst.wcwidth as _wcwidth
 
 N = _typing.TypeVar('N', int, float)
+# cell size of the grid containers use to find children under the mouse
+_GRID_X = 16
+_GRID_Y = 4
 _pattern_backspace = _re.compile('.' + chr(127))
 
 
@@ -22,6 +38,14 @@ def _dist(items, exe):
     return f
 
 
+# stop at the first item that consumes
+def _first(items, exe):
+    for i in items:
+        if exe(i):
+            return True
+    return False
+
+
 def _call(e):
     def f(w):
         e(w)
@@ -30,13 +54,107 @@ def _call(e):
     return f
 
 
+# run the awaitable returned by a callback on the serving loop
+def _await(r):
+    if _inspect.isawaitable(r):
+        w = Window.INSTANCE
+        if w is None or w._loop is None:
+            raise RuntimeError('Awaitable callbacks need Window.serve_async.')
+
+        def done(t: _asyncio.Future):
+            if not t.cancelled() and t.exception() is not None:
+                if w._done is not None and not w._done.done():
+                    w._done.set_exception(t.exception())
+            else:
+                w.request_frame()
+
+        _asyncio.ensure_future(r, loop=w._loop).add_done_callback(done)
+    return r
+
+
+_shared: _Optional[_futures.ThreadPoolExecutor] = None
+
+
+def _executor(e: _Optional[_futures.Executor]) -> _futures.Executor:
+    global _shared
+    if e is not None:
+        return e
+    if _shared is None:
+        _shared = _futures.ThreadPoolExecutor(1, 'pygraphicst')
+    return _shared
+
+
+# draw or repaint a child widget, timed per widget class when profiling
+def _draw(w: 'Widget', rects=None):
+    p = Window.INSTANCE.profiler if Window.INSTANCE is not None else None
+    if p is not None:
+        p.widget_enter(w)
+    try:
+        if rects is None:
+            w.on_draw()
+        else:
+            w.on_repaint(rects)
+    finally:
+        if p is not None:
+            p.widget_exit()
+
+
+# lines of a string after wrapping to length and cutting to [start, start + size) columns
+@_functools.lru_cache(maxsize=1024)
+def _layout(string: str, length: int, start: int, size: int) -> _typing.Tuple[str, ...]:
+    # handle backspace
+    string = _pattern_backspace.sub('', string)
+    if len(string) > 0 and string[0] == '\b':
+        string = string[1:]
+
+    return tuple(_wcwidth.slise(i, start, size) for i in _wcwidth.split(string, length))
+
+
+# rect is (x_left, y_top, x_size, y_size)
+def _intersects(a, b) -> bool:
+    return a[0] < b[0] + b[2] and b[0] < a[0] + a[2] and a[1] < b[1] + b[3] and b[1] < a[1] + a[3]
+
+
+def _coalesce(rects):
+    rects = [i for i in rects if i[2] > 0 and i[3] > 0]
+    merged = True
+    while merged:
+        merged = False
+        ret = []
+        for r in rects:
+            for i in range(len(ret)):
+                o = ret[i]
+                # merge overlapping or touching rects into their bounding box
+                if r[0] <= o[0] + o[2] and o[0] <= r[0] + r[2] and r[1] <= o[1] + o[3] and o[1] <= r[1] + r[3]:
+                    x, y = min(r[0], o[0]), min(r[1], o[1])
+                    ret[i] = (x, y, max(r[0] + r[2], o[0] + o[2]) - x, max(r[1] + r[3], o[1] + o[3]) - y)
+                    merged = True
+                    break
+            else:
+                ret.append(r)
+        rects = ret
+    return rects
+
+
+def layout_info():
+    return _layout.cache_info()
+
+
+def layout_clear():
+    _layout.cache_clear()
+
+
 class Timer:
     def __init__(self, ms: int, exe):
         self.frequency = ms / 1000
         self.next = _time.time() + self.frequency
         self.exe = exe
+        self._handle = None
 
     def trigger(self):
+        # armed timers are run by the window scheduler
+        if self._handle is not None:
+            return
         t = _time.time()
         if t >= self.next:
             self.exe()
@@ -45,6 +163,23 @@ class Timer:
 
     def reset(self):
         self.next = _time.time() + self.frequency
+        self.stop()
+        if Window.INSTANCE is not None:
+            self._handle = Window.INSTANCE.scheduler.call_later(self.frequency, self._fire)
+
+    def stop(self):
+        if self._handle is not None:
+            self._handle.cancel()
+            self._handle = None
+
+    def _fire(self):
+        scheduler = Window.INSTANCE.scheduler
+        d = self._handle.deadline + self.frequency
+        t = scheduler.clock()
+        while d <= t:
+            d += self.frequency
+        self._handle = scheduler.call_at(d, self._fire)
+        self.exe()
 
 
 class Logger:
@@ -63,10 +198,20 @@ class Canvas:
             self, string: str, x_left: int = 0, y_top: int = 0, length=0,
             attr=_constants.Attibute.NORMAL,
             color_f: int = _constants.Color.DEFAULT,
-            color_b: int = _constants.Color.DEFAULT
+            color_b: int = _constants.Color.DEFAULT,
+            style: _buffer.Style = None
     ):
         pass
 
+    # runs are (x_left, y_top, string, style) drawn without wrapping, style None is the default one
+    def draw_runs(self, runs: _typing.Iterable[_typing.Tuple[int, int, str, _Optional[_buffer.Style]]]):
+        pass
+
+    # cell [r][c] of matrix cut or padded to widths[c] columns, styles is None, a style or a matrix of them
+    def draw_grid(self, matrix: _typing.Sequence[_typing.Sequence[str]], widths: _typing.Sequence[int],
+                  styles=None, x_left: int = 0, y_top: int = 0):
+        pass
+
     def draw_border(self):
         pass
 
@@ -86,6 +231,11 @@ class Canvas:
     def xy_position(self) -> _typing.Tuple[int, int]:
         return 0, 0
 
+    # absolute area available for drawing
+    @property
+    def rect(self) -> _typing.Tuple[int, int, int, int]:
+        return 0, 0, 0, 0
+
 
 class Widget:
     def __init__(self, locator: _Callable = lambda x, y: (0, 0)):
@@ -93,6 +243,9 @@ class Widget:
         self.locator = locator
         self.x_left = self.y_top = -1
         self.container = None
+        # inputs of the last layout and geometry of the last canvas, to skip repeating them
+        self._located = None
+        self._canvas_key = None
 
     def on_refresh(self) -> None:
         pass
@@ -109,7 +262,10 @@ class Widget:
         self.canvas = canvas
 
     def on_layout(self, x, y) -> None:
-        self.x_left, self.y_top = [int(round(i)) for i in self.locator(x, y)]
+        k = (x, y, self.locator)
+        if k != self._located:
+            self._located = k
+            self.x_left, self.y_top = [int(round(i)) for i in self.locator(x, y)]
 
     def on_draw(self) -> None:
         pass
@@ -126,6 +282,46 @@ class Widget:
     def on_next(self) -> bool:
         return False
 
+    # keys consumed even when not focused, None if any key might be
+    @property
+    def hotkeys(self) -> _Optional[_typing.Iterable]:
+        return None
+
+    # call when hotkeys would return something else
+    def hotkeys_changed(self) -> None:
+        if self.container is not None:
+            self.container.hotkeys_changed()
+
+    # redraw because part of rects on screen was cleared
+    def on_repaint(self, rects) -> None:
+        self.on_draw()
+
+    # call when the locator or sizer would give something else for the same container size,
+    # the widget is laid out again by the next layout pass, at the end of the frame when serving
+    def relayout(self) -> None:
+        self._located = None
+        w = self.container
+        while w is not None:
+            if isinstance(w, WContainer):
+                w._laid = None
+            w = w.container
+        self.canvas_changed()
+        win = Window.INSTANCE
+        if win is not None and win.state == Window.STATE_SERVE:
+            win.post(win._relayout, win._relayout)
+
+    # let the next on_canvas pass reach this widget even if its geometry is the same
+    def canvas_changed(self) -> None:
+        w = self
+        while w is not None:
+            w._canvas_key = None
+            w = w.container
+
+    # clear and redraw the area of this widget at the end of the frame
+    def invalidate(self) -> None:
+        if self.canvas is not None and Window.INSTANCE is not None:
+            Window.INSTANCE.damage(*self.canvas.rect)
+
     @property
     def xy_position(self) -> [int, int]:
         return self.x_left, self.y_top
@@ -137,14 +333,28 @@ class Window:
     STATE_LAYOUT = 1
     STATE_SERVE = 2
 
-    def __init__(self, logger: _Callable = lambda s: ()):
-        self._window = None
+    def __init__(self, logger: _Callable = lambda s: (), backend: _backend.Backend = None):
+        self.backend = backend if backend is not None else _backend.CursesBackend()
+        self.buffer: _buffer.Buffer = None
         self.key_lsnr: [_Callable] = []
         self.mouse_lsnr = []
         self.logger = Logger(logger)
         self.period = 0.02
         self.cursor = (-1, -1)
         self._interface: WInterface = None
+        self._damage = []
+        self._loop: _asyncio.AbstractEventLoop = None
+        self._done: _asyncio.Future = None
+        self._frame: _asyncio.Handle = None
+        self._frame_exe = None
+        self._wake: _asyncio.Handle = None
+        self._wake_exe = None
+        self.scheduler = _scheduler.Scheduler(self.backend.clock, self._wake_set)
+        self._posts = {}
+        self._posts_lock = _threading.Lock()
+        self._posted = False
+        self._pipe = None
+        self.profiler: _profile.Profiler = None
         self.state = 0
 
     def __enter__(self):
@@ -157,12 +367,9 @@ class Window:
     def pause(self, log=True):
         if log:
             self.log('Paused')
-        while True:
-            try:
-                self._window.get_wch()
-                break
-            except _curses.error:
-                pass
+        self.flush()
+        while self.backend.read() is None:
+            self.backend.wait([], None)
 
         if log:
             self.log('Resumed')
@@ -172,75 +379,296 @@ class Window:
         if delay:
             _time.sleep(0.4)
 
-    def serve(self, cond: _Callable):
-        c = _curses.KEY_RESIZE
-        t = _time.time() + self.period
+    def damage(self, x_left, y_top, x_size, y_size):
+        self._damage.append((x_left, y_top, x_size, y_size))
+        self.request_frame()
+
+    def _repaint(self):
+        rects = _coalesce(self._damage)
+        self._damage.clear()
+        for i in rects:
+            self.buffer.fill(*i)
+        if len(rects) > 0:
+            _draw(self.interface, rects)
+
+    def _timed(self, phase, f, *args):
+        p = self.profiler
+        if p is None:
+            return f(*args)
+        t = p.clock()
+        try:
+            return f(*args)
+        finally:
+            p.add(phase, p.clock() - t)
+
+    def flush(self):
+        p = self.profiler
+        if self.state == Window.STATE_SERVE and self.interface is not None:
+            self._timed('draw', self._repaint)
+        t = None if p is None else p.clock()
+
+        def write(y, x, text, style):
+            if p is not None:
+                p.write(text)
+            self.backend.write(x, y, text, style)
+
+        self.buffer.flush(write)
+        # write everything once more if colour pairs were reused, if the screen needs more pairs
+        # than there are, some cells keep wrong colours
+        if self.backend.stale():
+            self.buffer.invalidate()
+            self.buffer.flush(write)
+            self.backend.stale()
+
+        # cursor
+        xm, ym = self.xy_size
+        xc, yc = self.cursor
+        if 0 <= xc < xm and 0 <= yc < ym:
+            self.backend.cursor(xc, yc)
+        else:
+            self.backend.cursor(-1, -1)
+
+        self.backend.update()
+        if p is not None:
+            p.refresh()
+            p.add('flush', p.clock() - t)
+            p.end()
+
+    def _clear(self):
+        self.backend.clear()
+        self.buffer.resize(*self.xy_size)
+
+    def _dispatch(self, c):
+        # enter unify
+        if c == '\r':
+            c = '\n'
+
+        # mouse event
+        if c == _curses.KEY_MOUSE:
+            m = self.backend.mouse()
+            if m is not None:
+                x, y, state = m
+                if not self.interface.on_mouse(x, y, state):
+                    _dist(self.mouse_lsnr, lambda l: _await(l(x, y, state)))
+
+        # resize event
+        elif c == _curses.KEY_RESIZE:
+            x, y = self.xy_size
+            self.state = Window.STATE_LAYOUT
+            self.interface.on_layout(x, y)
+            self._clear()
+            self.interface.on_canvas(self._canvas(0, 0))
+            self.damage(0, 0, x, y)
+            self.state = Window.STATE_SERVE
+
+        # key event
+        else:
+            if not self.interface.on_key(c):
+                _dist(self.key_lsnr, lambda w: _await(w(c)))
+
+    def call_later(self, delay: float, exe: _Callable) -> _scheduler.Handle:
+        return self.scheduler.call_later(delay, exe)
+
+    # exe is run by the serving thread, a later post with the same key replaces a pending one,
+    # posts without a key all run, so pass the widget being updated to only draw its last update
+    def post(self, exe: _Callable, key=None):
+        with self._posts_lock:
+            self._posts[object() if key is None else key] = exe
+            wake = not self._posted
+            self._posted = True
+        if wake and self._pipe is not None:
+            try:
+                _os.write(self._pipe[1], b'\0')
+            except (BlockingIOError, OSError):
+                pass
 
-        def run():
-            # mouse event
-            if c == _curses.KEY_MOUSE:
-                try:
-                    _, x, y, _, state = _curses.getmouse()
-                    if not self.interface.on_mouse(x, y, state):
-                        _dist(self.mouse_lsnr, lambda l: l(x, y, state))
-
-                except _curses.error:
-                    pass
-
-            # resize event
-            elif c == _curses.KEY_RESIZE:
-                y, x = self._window.getmaxyx()
-                self.state = Window.STATE_LAYOUT
-                self.interface.on_layout(x, y)
-                self._window.clear()
-                self.interface.on_canvas(self._canvas(0, 0))
-                self.interface.on_draw()
-                self.state = Window.STATE_SERVE
-
-            # key event
-            else:
-                if not self.interface.on_key(c):
-                    _dist(self.key_lsnr, lambda w: w(c))
+    def _drain(self):
+        try:
+            while _os.read(self._pipe[0], 512):
+                pass
+        except (BlockingIOError, OSError):
+            pass
+        with self._posts_lock:
+            posts = self._posts
+            self._posts = {}
+            self._posted = False
+        for i in posts.values():
+            i()
+
+    # lay out again after widgets asked for it, subtrees that did not change are skipped
+    def _relayout(self):
+        if self.interface is None:
+            return
+        x, y = self.xy_size
+        self.state = Window.STATE_LAYOUT
+        self.interface.on_layout(x, y)
+        self.interface.on_canvas(self._canvas(0, 0))
+        self.damage(0, 0, x, y)
+        self.state = Window.STATE_SERVE
 
-        while True:
-            if c != _constants.Key.ERR:
+    def _resize(self):
+        self.backend.resize()
+        self._timed('layout', self._dispatch, _curses.KEY_RESIZE)
 
-                # enter unify
-                if c == '\r':
-                    c = '\n'
+    # set period to None to stop calling on_refresh, then the loop only wakes for input, posts and timers
+    def serve(self, cond: _Callable):
+        clock = self.backend.clock
+        resized = [False]
 
-                run()
+        # the handler runs on this thread, possibly while it holds the post lock
+        def winch(*_):
+            resized[0] = True
+            try:
+                _os.write(self._pipe[1], b'\0')
+            except (BlockingIOError, OSError):
+                pass
 
-            if not cond() or self.interface is None:
-                break
+        main = self.backend.tty and _threading.current_thread() is _threading.main_thread()
+        winch_old = _signal.signal(_signal.SIGWINCH, winch) if main else None
+        try:
+            self._timed('layout', self._dispatch, _curses.KEY_RESIZE)
+            t = None if self.period is None else clock() + self.period
+
+            while True:
+                if self.profiler is not None:
+                    self.profiler.begin()
+                self._timed('posts', self._drain)
+                if resized[0]:
+                    resized[0] = False
+                    self._resize()
+
+                while True:
+                    c = self.backend.read()
+                    if c is None:
+                        break
+                    self._timed('layout' if c == _curses.KEY_RESIZE else 'input', self._dispatch, c)
+
+                if not cond() or self.interface is None:
+                    break
+
+                self._timed('timers', self.scheduler.run)
+
+                # _time check
+                td = None
+                if self.period is not None:
+                    t = clock() + self.period if t is None else t
+                    td = t - clock()
+                    if td <= 0:
+                        self._timed('refresh', self.interface.on_refresh)
+                        t += self.period
+                        td += self.period
+                        while td <= 0:
+                            self.log('Frame dropped!')
+                            t += self.period
+                            td += self.period
+
+                # sleep until the next timer at most
+                d = self.scheduler.next()
+                if d is not None:
+                    d -= self.scheduler.clock()
+                    td = d if td is None else min(td, d)
+
+                self.flush()
+                self.backend.wait([self._pipe[0]], None if td is None else max(0.0, td))
+        finally:
+            if main:
+                _signal.signal(_signal.SIGWINCH, winch_old if winch_old is not None else _signal.SIG_DFL)
+
+    # without the period tick, widgets animate with Timer and callbacks may return awaitables
+    async def serve_async(self, cond: _Callable):
+        loop = _asyncio.get_running_loop()
+        fd = self.backend.fileno()
+        if fd is None:
+            raise RuntimeError('Backend has no input to watch.')
+        done = loop.create_future()
+
+        def guard(f):
+            def g():
+                try:
+                    if self.profiler is not None:
+                        self.profiler.begin()
+                    f()
+                except BaseException as e:
+                    if not done.done():
+                        done.set_exception(e)
 
-            # _time check
-            td = t - _time.time()
-            if td <= 0:
-                self.interface.on_refresh()
-                t += self.period
-                td += self.period
-                while td <= 0:
-                    self.log('Frame dropped!')
-                    t += self.period
-                    td += self.period
-
-            timeout = _math.ceil(td * 1000)
-            self._window.timeout(timeout)
-
-            # cursor
-            ym, xm = self._window.getmaxyx()
-            xc, yc = self.cursor
-            if 0 <= xc < xm and 0 <= yc < ym:
-                _curses.curs_set(1)
-                self._window.move(yc, xc)
-            else:
-                _curses.curs_set(0)
+            return g
 
-            try:
-                c = self._window.get_wch()
-            except _curses.error:
-                c = _constants.Key.ERR
+        def frame():
+            if not cond() or self.interface is None:
+                self._frame = None
+                if not done.done():
+                    done.set_result(None)
+            else:
+                self.flush()
+                # drawing while flushing asks for a frame that this one already shows
+                if self._frame is not None:
+                    self._frame.cancel()
+                    self._frame = None
+
+        def ready():
+            while True:
+                c = self.backend.read()
+                if c is None:
+                    break
+                self._timed('layout' if c == _curses.KEY_RESIZE else 'input', self._dispatch, c)
+            frame()
+
+        def resize():
+            self._resize()
+            frame()
+
+        def posts():
+            self._timed('posts', self._drain)
+            frame()
+
+        def timers():
+            self._wake = None
+            self._timed('timers', self.scheduler.run)
+            self._wake_set()
+            frame()
+
+        self._loop = loop
+        self._done = done
+        self._frame_exe = guard(frame)
+        self._wake_exe = guard(timers)
+        self._wake_set()
+        loop.add_reader(fd, guard(ready))
+        loop.add_reader(self._pipe[0], guard(posts))
+        if self.backend.tty:
+            loop.add_signal_handler(_signal.SIGWINCH, guard(resize))
+        try:
+            loop.call_soon(guard(resize))
+            await done
+        finally:
+            loop.remove_reader(fd)
+            loop.remove_reader(self._pipe[0])
+            if self.backend.tty:
+                loop.remove_signal_handler(_signal.SIGWINCH)
+            if self._frame is not None:
+                self._frame.cancel()
+                self._frame = None
+            if self._wake is not None:
+                self._wake.cancel()
+                self._wake = None
+            self._loop = self._done = self._frame_exe = self._wake_exe = None
+
+    # schedule a frame when serving on asyncio, the sync loop flushes after each wake up anyway,
+    # the buffer asks for one when it changes
+    def request_frame(self):
+        if self._loop is not None and self._frame is None:
+            self._frame = self._loop.call_soon(self._frame_exe)
+
+    # let the event loop wake up for the earliest timer
+    def _wake_set(self):
+        if self._loop is None:
+            return
+        if self._wake is not None:
+            self._wake.cancel()
+            self._wake = None
+        d = self.scheduler.next()
+        if d is not None:
+            self._wake = self._loop.call_later(max(0.0, d - self.scheduler.clock()), self._wake_exe)
 
     def initialize(self):
         if Window.INSTANCE is not None:
@@ -248,39 +676,20 @@ class Window:
 
         Window.INSTANCE = self
 
-        def init_color():
-            for a in range(-1, 15):
-                for b in range(-1, 15):
-                    if a != -1 or b != -1:
-                        _curses.init_pair(self._color(a, b), a, b)
-
-        self._window = _curses.initscr()
-        self._window.keypad(True)
-        self._window.timeout(1000)
-        _curses.noecho()
-        _curses.cbreak()
-        _curses.mouseinterval(1)
-        _curses.mousemask(0 | _curses.BUTTON1_PRESSED | _curses.BUTTON1_RELEASED)
-        _curses.curs_set(0)
-
-        try:
-            _curses.start_color()
-            _curses.use_default_colors()
-            init_color()
-        except _curses.error:
-            pass
+        self._pipe = _os.pipe()
+        for i in self._pipe:
+            _os.set_blocking(i, False)
+        self.backend.initialize()
+        self.buffer = _buffer.Buffer(*self.xy_size)
+        # changes drawn outside of input, posts and timers still get to the screen on asyncio
+        self.buffer.on_dirty = self.request_frame
 
     def terminate(self):
         Window.INSTANCE = None
-        self._window.keypad(0)
-        _curses.echo()
-        _curses.nocbreak()
-        _curses.curs_set(1)
-        _curses.endwin()
-
-    @staticmethod
-    def _color(fg, bg):
-        return (fg + 1) * 17 + bg + 1
+        self.backend.terminate()
+        for i in self._pipe:
+            _os.close(i)
+        self._pipe = None
 
     def _canvas(self, x_left_=0, y_top_=0, x_size_=0, y_size_=0, x_start_=0, y_start_=0):
         class Cvs(Canvas):
@@ -288,7 +697,7 @@ class Window:
             def __init__(self, x_left=0, y_top=0, x_size=0, y_size=0, x_start=0, y_start=0):
                 self.x_left = x_left
                 self.y_top = y_top
-                y, x = Window.INSTANCE._window.getmaxyx()
+                x, y = Window.INSTANCE.xy_size
                 self.x_size = x - x_left if x_size == 0 else x_size
                 self.y_size = y - y_top if y_size == 0 else y_size
                 if x_left + x_size > x or y_top + y_size > y:
@@ -301,44 +710,125 @@ class Window:
                     wrap: bool = True, length=0,
                     attr=_constants.Attibute.NORMAL,
                     color_f: int = _constants.Color.DEFAULT,
-                    color_b: int = _constants.Color.DEFAULT
+                    color_b: int = _constants.Color.DEFAULT,
+                    style: _buffer.Style = None
             ):
-                # handle backspace
-                string = _pattern_backspace.sub('', string)
-                if len(string) > 0 and string[0] == '\b':
-                    string = string[1:]
-
-                # get values
-                at = attr | _curses.color_pair(Window.INSTANCE._color(color_f, color_b))
+                # get values, a style from buffer.style replaces attr and colors
+                if style is None:
+                    style = _buffer.style(attr, color_f, color_b)
                 y_draw = y_top + self.y_start + self.y_top
                 x_draw = x_left + self.x_start + self.x_left
                 length = length if length != 0 else self.x_size - x_left - self.x_start
-                # split to lines
-                strs = _wcwidth.split(string, -1 if not wrap else length)
-                # cut to canvas size
+                # split to lines and cut to canvas size
                 if x_draw < 0:
-                    for i in range(len(strs)):
-                        strs[i] = _wcwidth.slise(strs[i], -x_draw, self.x_size)
+                    strs = _layout(string, -1 if not wrap else length, -x_draw, self.x_size)
                 else:
-                    for i in range(len(strs)):
-                        strs[i] = _wcwidth.slise(strs[i], 0, self.x_size - x_left - self.x_start)
+                    strs = _layout(string, -1 if not wrap else length, 0, self.x_size - x_left - self.x_start)
                 # move cursor after cutting
                 x_draw = max(0, x_draw)
                 # draw strings
+                buffer = Window.INSTANCE.buffer
                 for i in strs:
-                    if y_draw == self.y_size:
+                    if y_draw >= self.y_top + self.y_size:
                         break
-                    try:
-                        Window.INSTANCE._window.addstr(y_draw, x_draw, i, at)
-                    except _curses.error:
-                        pass
+                    buffer.put(x_draw, y_draw, i, style)
                     y_draw += 1
-                Window.INSTANCE._window.refresh()
+
+            # put s of width w at absolute x, y, clipped to the canvas
+            def _put(self, x, y, s, style, w):
+                x0, x1 = self.x_left + self.x_start, self.x_left + self.x_size
+                if x < x0 or x + w > x1:
+                    if x >= x1 or x + w <= x0:
+                        return
+                    s = _wcwidth.slise(s, max(0, x0 - x), x1 - max(x, x0))
+                    x = max(x, x0)
+                Window.INSTANCE.buffer.put(x, y, s, style)
+
+            def draw_runs(self, runs):
+                x0, y0 = self.x_left + self.x_start, self.y_top + self.y_start
+                x1, y1 = self.x_left + self.x_size, self.y_top + self.y_size
+
+                # [x, y, parts, style, end] of the runs being merged
+                m = None
+                for x, y, s, style in runs:
+                    x += x0
+                    y += y0
+                    if style is None:
+                        style = _buffer.STYLE_DEFAULT
+                    if m is not None and m[4] == x and m[1] == y and m[3] == style:
+                        m[2].append(s)
+                        m[4] += _wcwidth.width(s)
+                        continue
+                    if m is not None:
+                        self._put(m[0], m[1], ''.join(m[2]), m[3], m[4] - m[0])
+                        m = None
+                    if y0 <= y < y1 and x < x1:
+                        m = [x, y, [s], style, x + _wcwidth.width(s)]
+                if m is not None:
+                    self._put(m[0], m[1], ''.join(m[2]), m[3], m[4] - m[0])
+
+            def draw_grid(self, matrix, widths, styles=None, x_left=0, y_top=0):
+                x0, y0 = self.x_left + self.x_start, self.y_top + self.y_start
+                x_end = self.x_size - self.x_start
+                # only rows and columns in the canvas
+                rows = range(max(0, -y_top), min(len(matrix), self.y_size - self.y_start - y_top))
+                if len(rows) == 0:
+                    return
+                if styles is None:
+                    styles = _buffer.STYLE_DEFAULT
+                single = isinstance(styles[0], int)
+                cols = []
+                x = x_left
+                for c, w in enumerate(widths):
+                    if x >= x_end:
+                        break
+                    if x + w > 0:
+                        cols.append((c, w))
+                    x += w
+                if len(cols) == 0:
+                    return
+                x_first = x_left + sum(widths[:cols[0][0]])
+
+                for r in range(rows.start, rows.stop):
+                    row = matrix[r]
+                    cells = [row[c] for c, _ in cols]
+                    if _wcwidth.narrow(''.join(cells)):
+                        cells = [s[:w].ljust(w) for s, (_, w) in zip(cells, cols)]
+                    else:
+                        cells = [_wcwidth.slise(s, 0, w) for s, (_, w) in zip(cells, cols)]
+                        cells = [s + ' ' * (w - _wcwidth.width(s)) for s, (_, w) in zip(cells, cols)]
+                    y = y0 + y_top + r
+                    if single:
+                        self._put(x0 + x_first, y, ''.join(cells), styles, x - x_first)
+                        continue
+                    # one put for each stretch of cells with the same style
+                    x = x0 + x_first
+                    start = 0
+                    for i in range(1, len(cols) + 1):
+                        if i == len(cols) or styles[r][cols[i][0]] != styles[r][cols[start][0]]:
+                            w = sum(w for _, w in cols[start:i])
+                            self._put(x, y, ''.join(cells[start:i]), styles[r][cols[start][0]], w)
+                            x += w
+                            start = i
 
             def draw_border(self):
-                w = Window.INSTANCE._window.subwin(self.y_size, self.x_size, self.y_top, self.x_left)
-                w.border()
-                w.refresh()
+                buffer = Window.INSTANCE.buffer
+                x_size, y_size = self.x_size, self.y_size
+                if x_size < 2 or y_size < 2:
+                    return
+                line = '─' * (x_size - 2)
+                buffer.put(self.x_left, self.y_top, '┌' + line + '┐')
+                for i in range(self.y_top + 1, self.y_top + y_size - 1):
+                    buffer.put(self.x_left, i, '│')
+                    buffer.put(self.x_left + x_size - 1, i, '│')
+                buffer.put(self.x_left, self.y_top + y_size - 1, '└' + line + '┘')
+
+            @property
+            def rect(self) -> _typing.Tuple[int, int, int, int]:
+                return (
+                    self.x_left + self.x_start, self.y_top + self.y_start,
+                    self.x_size - self.x_start, self.y_size - self.y_start
+                )
 
             def cursor_set(self, x, y):
                 Window.INSTANCE.cursor = self.x_left + self.x_start + x, self.y_top + self.y_start + y
@@ -356,15 +846,13 @@ class Window:
                 )
 
             def clear(self):
-                w = Window.INSTANCE._window.subwin(self.y_size, self.x_size, self.y_top, self.x_left)
-                w.clear()
-                w.refresh()
+                Window.INSTANCE.buffer.fill(self.x_left, self.y_top, self.x_size, self.y_size)
 
         return Cvs(x_left_, y_top_, x_size_, y_size_, x_start_, y_start_)
 
     @property
     def xy_size(self):
-        return self._window.getmaxyx()[::-1]
+        return self.backend.xy_size
 
     @property
     def interface(self):
@@ -376,9 +864,9 @@ class Window:
         self._interface.on_window(self)
         if self.state == Window.STATE_SERVE:
             self._interface.on_layout(*self.xy_size)
-            self._window.clear()
+            self._clear()
             self._interface.on_canvas(self._canvas(0, 0))
-            self._interface.on_draw()
+            self.damage(0, 0, *self.xy_size)
 
 
 class WBoundary(Widget):
@@ -389,10 +877,18 @@ class WBoundary(Widget):
         Widget.__init__(self, locator)
         self.x_size = self.y_size = 0
         self.sizer = sizer
+        self._sized = None
+
+    def relayout(self) -> None:
+        self._sized = None
+        super().relayout()
 
     def on_layout(self, x, y):
         super().on_layout(x, y)
-        self.x_size, self.y_size = [int(round(i)) for i in self.sizer(x, y)]
+        k = (x, y, self.sizer)
+        if k != self._sized:
+            self._sized = k
+            self.x_size, self.y_size = [int(round(i)) for i in self.sizer(x, y)]
 
     def on_canvas(self, canvas: Canvas) -> None:
         super().on_canvas(canvas.canvas(0, 0, *self.xy_size, 0, 0))
@@ -414,57 +910,109 @@ class WContainer(WBoundary):
         WBoundary.__init__(self, locator, sizer)
         self._widgets: [Widget] = []
         self._focus = None
+        # key -> children with it as a hotkey, and children asked for every key
+        self._hotkeys: _typing.Dict[_typing.Any, _typing.List[Widget]] = None
+        self._broadcast: _typing.List[Widget] = []
+        # grid cell -> (order, child) overlapping it, and children without a size that see every click
+        self._grid: _typing.Dict[_typing.Tuple[int, int], _typing.List[_typing.Tuple[int, Widget]]] = None
+        self._floating: _typing.List[_typing.Tuple[int, Widget]] = []
+        # size the children were laid out in
+        self._laid = None
 
     def widget_add(self, w: Widget):
         self._widgets.append(w)
+        self._grid = None
         w.on_container(self)
+        self.hotkeys_changed()
+        self.canvas_changed()
         if Window.INSTANCE.state is not Window.STATE_INIT and self.x_left != -1 and self.y_top != -1:
             w.on_layout(*self.xy_size)
         if Window.INSTANCE.state is Window.STATE_SERVE and self.canvas is not None:
             w.on_canvas(self.canvas.canvas(0, 0, *self.xy_size, *w.xy_position))
-            w.on_draw()
+            _draw(w)
 
     def widget_remove(self, w: Widget):
+        if Window.INSTANCE.state is not Window.STATE_LAYOUT:
+            w.invalidate()
+
         if self.focus is w:
             self.focus = None
             if self.focus is not None:
                 raise RuntimeError('Window focus refuses to release.')
             self._widgets.remove(w)
+            self._grid = None
+            self.hotkeys_changed()
+            self.canvas_changed()
             for i in self._widgets:
                 self.focus = i
                 if self.focus is i:
                     return
         else:
             self._widgets.remove(w)
-
-        if self.canvas is not None and Window.INSTANCE.state is not Window.STATE_LAYOUT:
-            self.canvas.clear()
-            self.on_draw()
+            self._grid = None
+            self.hotkeys_changed()
+            self.canvas_changed()
 
     def widget_clear(self):
         self._widgets.clear()
+        self._grid = None
+        self.hotkeys_changed()
+        self.canvas_changed()
         self.focus = None
         if self.focus is not None:
             raise RuntimeError('Window focus refuses to release.')
 
-        if self.canvas is not None and Window.INSTANCE.state is not Window.STATE_LAYOUT:
-            self.canvas.clear()
-            self.on_draw()
+        if Window.INSTANCE.state is not Window.STATE_LAYOUT:
+            self.invalidate()
 
     def on_draw(self) -> None:
-        _dist(self._widgets, _call(lambda w: w.on_draw()))
+        _dist(self._widgets, _call(_draw))
+
+    def on_repaint(self, rects) -> None:
+        for i in self._widgets:
+            if i.canvas is not None and any(_intersects(i.canvas.rect, r) for r in rects):
+                _draw(i, rects)
 
+    # children are laid out in the size of this, they are left alone while it is unchanged
     def on_layout(self, x, y) -> None:
         super().on_layout(x, y)
-        _dist(self._widgets, _call(lambda w: w.on_layout(x, y)))
+        if self._laid != self.xy_size:
+            self._laid = self.xy_size
+            _dist(self._widgets, _call(lambda w: w.on_layout(*self.xy_size)))
+            self._grid = None
+
+    # sized children only see clicks inside them, the ones not handling mouse are left out
+    def _grid_build(self):
+        self._grid = {}
+        self._floating = []
+        xm, ym = self.xy_size
+        for n, w in enumerate(self._widgets):
+            if type(w).on_mouse is Widget.on_mouse:
+                continue
+            if not isinstance(w, WBoundary):
+                self._floating.append((n, w))
+                continue
+            xl, yt = w.xy_position
+            xs, ys = w.xy_size
+            for i in range(max(xl, 0) // _GRID_X, (min(xl + xs, xm) - 1) // _GRID_X + 1):
+                for j in range(max(yt, 0) // _GRID_Y, (min(yt + ys, ym) - 1) // _GRID_Y + 1):
+                    self._grid.setdefault((i, j), []).append((n, w))
+
+    # children that may take a click at (x, y), in the order they were added
+    def _at(self, x, y) -> _typing.Iterable[_typing.Tuple[int, Widget]]:
+        if self._grid is None:
+            self._grid_build()
+        c = self._grid.get((x // _GRID_X, y // _GRID_Y), ())
+        return c if len(self._floating) == 0 else _heapq.merge(c, self._floating)
 
     def on_mouse(self, x, y, state) -> bool:
         if super().encloses(x, y):
-            def f(w: Widget):
+            def f(i):
+                w = i[1]
                 xw, yw = w.xy_position
                 return w.on_mouse(x - xw, y - yw, state)
 
-            if not _dist(self._widgets, f):
+            if not _first(self._at(x, y), f):
                 self.focus = None
                 return False
             else:
@@ -472,18 +1020,61 @@ class WContainer(WBoundary):
         else:
             return False
 
+    # children keep their canvases when they would get the same ones again
     def on_canvas(self, canvas: Canvas) -> None:
         super().on_canvas(canvas)
-        _dist(self._widgets, _call(lambda w: w.on_canvas(
-            canvas.canvas(0, 0, *self.xy_size, *w.xy_position)
-        )))
+        x, y = canvas.rect[:2]
+        for i in self._widgets:
+            xi, yi = i.xy_position
+            # sized widgets draw on a canvas of their size, the others are only clipped by this
+            k = (x + xi, y + yi, *i.xy_size) if isinstance(i, WBoundary) else (x, y, *self.xy_size, xi, yi)
+            if k != i._canvas_key:
+                i.on_canvas(canvas.canvas(0, 0, *self.xy_size, xi, yi))
+                i._canvas_key = k
 
     @property
     def xy_position(self) -> [int, int]:
         return self.x_left, self.y_top
 
+    # the focused child first, then children with ch as a hotkey, then the ones that take any key
     def on_key(self, ch) -> bool:
-        return _dist(self._widgets, lambda w: w.on_key(ch))
+        f = self.focus
+        if f is not None and f.on_key(ch):
+            return True
+        if self._hotkeys is None:
+            self._index()
+        for i in self._hotkeys.get(ch, ()):
+            if i is not f and i.on_key(ch):
+                return True
+        for i in self._broadcast:
+            if i is not f and i.on_key(ch):
+                return True
+        return False
+
+    def _index(self):
+        self._hotkeys = {}
+        self._broadcast = []
+        for i in self._widgets:
+            ks = i.hotkeys
+            if ks is None:
+                self._broadcast.append(i)
+                continue
+            for k in ks:
+                l = self._hotkeys.setdefault(k, [])
+                if len(l) == 0 or l[-1] is not i:
+                    l.append(i)
+
+    @property
+    def hotkeys(self):
+        if self._hotkeys is None:
+            self._index()
+        return None if len(self._broadcast) > 0 else self._hotkeys.keys()
+
+    def hotkeys_changed(self):
+        # ancestors of a stale index are stale already
+        if self._hotkeys is not None:
+            self._hotkeys = None
+            super().hotkeys_changed()
 
     def on_refresh(self) -> None:
         _dist(self._widgets, _call(lambda w: w.on_refresh()))
@@ -491,7 +1082,7 @@ class WContainer(WBoundary):
     def on_container(self, container):
         super().on_container(container)
         for i in self._widgets:
-            i.on_container(container)
+            i.on_container(self)
 
     def log(self, s, type_=0, delay=False):
         self.container.log(s, type_, delay)
@@ -634,6 +1225,10 @@ class WLabel(Widget):
             self.text = s
             self.canvas.draw_str(s)
 
+    @property
+    def hotkeys(self):
+        return ()
+
 
 class WStatus(WLabel):
     def __init__(self):
@@ -650,14 +1245,15 @@ class WButton(WBoundary):
         WBoundary.__init__(self, lambda x, y: locator(x, y, self.pos_x))
         self.text = text
         self.exe = exe
-        self.keys = keys if keys is not None else []
+        # a tuple, the hotkey index only hears of new keys through the setter
+        self._keys = tuple(keys) if keys is not None else ()
         self.width = width
         self.auto = auto
         self.cnf = color_normal_f
         self.cnb = color_normal_b
         self.cff = color_focused_f
         self.cfb = color_focused_b
-        self.pos_x = width if not auto else 2 * width + _wcwidth.width(text)
+        self._pos_x = width if not auto else 2 * width + _wcwidth.width(text)
 
     def on_focused(self) -> bool:
         if self.canvas is not None:
@@ -668,12 +1264,36 @@ class WButton(WBoundary):
         self.on_draw()
         return True
 
+    # the width, which the locator takes too
+    @property
+    def pos_x(self):
+        return self._pos_x
+
+    @pos_x.setter
+    def pos_x(self, x):
+        if x != self._pos_x:
+            self._pos_x = x
+            self.relayout()
+
+    @property
+    def keys(self):
+        return self._keys
+
+    @keys.setter
+    def keys(self, keys):
+        self._keys = tuple(keys) if keys is not None else ()
+        self.hotkeys_changed()
+
+    @property
+    def hotkeys(self):
+        return self._keys
+
     def on_key(self, ch):
         if ch in self.keys:
-            self.exe()
+            _await(self.exe())
             return True
         if self is self.container.focus and ch == '\n':
-            self.exe()
+            _await(self.exe())
             return True
 
     def on_mouse(self, x, y, state):
@@ -682,24 +1302,22 @@ class WButton(WBoundary):
                 self.container.focus = self
                 return True
             elif state == _constants.Button.B1_RELEASED and self.container.focus is self:
-                self.exe()
+                _await(self.exe())
                 return True
         return False
 
     def on_draw(self):
         if self.container.focus is self:
-            cf = self.cff
-            cb = self.cfb
+            style = _buffer.style(0, self.cff, self.cfb)
         else:
-            cf = self.cnf
-            cb = self.cnb
+            style = _buffer.style(0, self.cnf, self.cnb)
 
         if self.auto:
             s = (self.width * ' ') + self.text + (self.width * ' ')
-            self.canvas.draw_str(s, color_f=cf, color_b=cb, wrap=False)
+            self.canvas.draw_str(s, style=style, wrap=False)
         else:
-            self.canvas.draw_str(self.width * ' ', color_f=cf, color_b=cb)
-            self.canvas.draw_str(self.text, color_f=cf, color_b=cb)
+            self.canvas.draw_str(self.width * ' ', style=style)
+            self.canvas.draw_str(self.text, style=style)
 
     @property
     def xy_size(self) -> [int, int]:
@@ -710,7 +1328,9 @@ class WText(WBoundary):
     def _inv(self):
         if self.container.focus is self:
             self.inv = not self.inv
-            self.on_draw()
+            self._draw_cursor()
+        else:
+            self.Timer.stop()
 
     def __init__(
             self, secret=False,
@@ -722,7 +1342,9 @@ class WText(WBoundary):
         self.secret = secret
         self.cursor = (0, 0)
         self.pos = (0, 0)
-        self.lines: [str] = ['']
+        self.doc = _document.Document()
+        # lines [start, end) edited since the last refresh
+        self._edited = None
         self.inv = True
         self.Timer = Timer(500, self._inv)
         self.cnf = color_normal_f
@@ -747,33 +1369,52 @@ class WText(WBoundary):
             return True
         return False
 
-    def on_refresh(self) -> None:
-        self.Timer.trigger()
+    # the content, read only so that edits in place fail, assigning it replaces the document
+    @property
+    def lines(self) -> _typing.Tuple[str, ...]:
+        return tuple(self.doc)
+
+    @lines.setter
+    def lines(self, lines: _typing.Iterable[str]):
+        self.doc = _document.Document(lines)
 
     def _get_index(self, x, y):
-        s = self.lines[y]
-        csr, _ = _wcwidth.index(s, x, True)
-        csr = csr if csr != -1 else len(s)
-        return csr, y
+        return self.doc.index(y, x, True), y
 
     def _get_char_at(self, x, y):
-        s = self.lines[y]
+        s = self.doc.line(y)
         if x == len(s):
             return ' '
         else:
             return s[x]
 
+    def _style(self):
+        if self is self.container.focus:
+            return _buffer.style(0, self.cff, self.cfb)
+        return _buffer.style(0, self.cnf, self.cnb)
+
     def on_draw(self) -> None:
         self.canvas.clear()
 
-        for i in range(self.pos[1], min(self.pos[1] + self.xy_size[1], len(self.lines))):
-            s = self.lines[i]
-            self.canvas.draw_str(s, x_left=-self.pos[0], y_top=i - self.pos[1], wrap=False)
+        style = self._style()
+        for i in range(self.pos[1], min(self.pos[1] + self.xy_size[1], len(self.doc))):
+            s = self.doc.line(i)
+            self.canvas.draw_str(s, x_left=-self.pos[0], y_top=i - self.pos[1], wrap=False, style=style)
 
+        self._draw_cursor()
+
+    # redraw line i in place, blank if it is past the end
+    def _draw_line(self, i, style):
+        xp, yp = self.pos
+        self.canvas.draw_str(' ' * self.x_size, y_top=i - yp, wrap=False, style=style)
+        if i < len(self.doc):
+            self.canvas.draw_str(self.doc.line(i), x_left=-xp, y_top=i - yp, wrap=False, style=style)
+
+    def _draw_cursor(self):
         if self is self.container.focus:
             xp, yp = self.pos
             xc, yc = self.cursor
-            self.canvas.cursor_set(min(_wcwidth.width(self.lines[yc]), xc) - xp, yc - yp)
+            self.canvas.cursor_set(min(self.doc.width(yc), xc) - xp, yc - yp)
         else:
             self.canvas.cursor_unset()
 
@@ -797,29 +1438,54 @@ class WText(WBoundary):
         return False
 
     def on_unfocused(self, w) -> bool:
+        self.Timer.stop()
         self.on_draw()
         return True
 
+    # only takes keys when focused
+    @property
+    def hotkeys(self):
+        return ()
+
     def on_focused(self) -> bool:
+        if self.canvas is not None and (self.cff, self.cfb) != (self.cnf, self.cnb):
+            self.on_draw()
         self._cursor_refresh()
         return True
 
+    def _edit(self, start, end):
+        if self._edited is None:
+            self._edited = (start, end)
+        else:
+            self._edited = (min(start, self._edited[0]), max(end, self._edited[1]))
+
     def add_char(self, ch):
-        x, y = self.cursor
         x_, y_ = self._get_index(*self.cursor)
-        s = self.lines[y]
-        self.cursor = (_wcwidth.width(s[:x_] + ch), y_)
-        self.lines[y] = s[:x_] + ch + s[x_:]
+        self._edit(y_, y_ + 1)
+        self.doc.insert(y_, x_, ch)
+        self.cursor = (self.doc.column(y_, x_ + len(ch)), y_)
 
     def _get_cursor_at(self, x, y):
         xp, yp = self.pos
-        return x + xp, min(len(self.lines) - 1, y + yp)
+        return x + xp, min(len(self.doc) - 1, y + yp)
 
+    # only edited lines are redrawn unless the view scrolled
     def _cursor_refresh(self):
         self.inv = True
+        pos = self.pos
         self._pos_move_no_trailing()
         self._pos_move_show_cursor()
-        self.on_draw()
+        if self.canvas is not None:
+            if self.pos != pos:
+                self.on_draw()
+            else:
+                if self._edited is not None:
+                    yp = self.pos[1]
+                    style = self._style()
+                    for i in range(max(self._edited[0], yp), min(self._edited[1], yp + self.y_size)):
+                        self._draw_line(i, style)
+                self._draw_cursor()
+        self._edited = None
         self.Timer.reset()
 
     def _pos_move_show_cursor(self):
@@ -844,13 +1510,10 @@ class WText(WBoundary):
         xl, yt = self.pos
         xr = xl + self.x_size
         yb = yt + self.y_size
-        x_max = 0
+        x_max = max(self.doc.max_width(), self.doc.width(self.cursor[1]) + 1)
 
-        for i in range(len(self.lines)):
-            x_max = max(x_max, _wcwidth.width(self.lines[i]) + (0 if self.cursor[1] != i else 1))
-
-        if yb > len(self.lines):
-            yt = max(0, len(self.lines) - self.y_size)
+        if yb > len(self.doc):
+            yt = max(0, len(self.doc) - self.y_size)
 
         if xr > x_max:
             xl = max(0, x_max - self.x_size)
@@ -859,27 +1522,23 @@ class WText(WBoundary):
 
     def op_backspace(self):
         x, y = self.cursor
-        s = self.lines[y]
         if x != 0:
-            l = _wcwidth.width(s)
-            if x >= l:
-                self.lines[y] = s[:-1]
-                self.cursor = (l - _wcwidth.width(s[-1]), y)
-            else:
-                x_, y_ = self._get_index(x, y)
-                self.cursor = (x - _wcwidth.width(self._get_char_at(x_ - 1, y_)), y)
-                self.lines[y] = s[:x_ - 1] + s[x_:]
+            x_, _ = self._get_index(x, y)
+            if x_ > 0:
+                self._edit(y, y + 1)
+                self.doc.delete(y, x_ - 1)
+                self.cursor = (self.doc.column(y, x_ - 1), y)
         else:
             if y != 0:
-                self.cursor = (_wcwidth.width(self.lines[y - 1]), y - 1)
-                self.lines[y - 1] += self.lines[y]
-                self.lines.pop(y)
+                # lines below move up, the last one is left blank
+                self._edit(y - 1, len(self.doc))
+                self.cursor = (self.doc.width(y - 1), y - 1)
+                self.doc.join(y - 1)
 
     def op_enter(self):
         x_, y_ = self._get_index(*self.cursor)
-        s = self.lines[y_]
-        self.lines[y_] = s[:x_]
-        self.lines.insert(y_ + 1, s[x_:])
+        self._edit(y_, len(self.doc) + 1)
+        self.doc.split(y_, x_)
         self.cursor = (0, y_ + 1)
 
     def op_cursor_up(self):
@@ -891,31 +1550,27 @@ class WText(WBoundary):
 
     def op_cursor_down(self):
         x, y = self.cursor
-        if y != len(self.lines) - 1:
+        if y != len(self.doc) - 1:
             self.cursor = (x, y + 1)
         else:
-            self.cursor = (_wcwidth.width(self.lines[-1]), y)
+            self.cursor = (self.doc.width(y), y)
 
     def op_cursor_left(self):
         x, y = self.cursor
-        l = _wcwidth.width(self.lines[y])
-        x_, y_ = self._get_index(x, y)
-        w = _wcwidth.width(self._get_char_at(x_ - 1, y_))
-
         if x == 0:
             if y != 0:
-                self.cursor = (len(self.lines[y - 1]), y - 1)
-        elif x >= l:
-            self.cursor = (l - w, y)
+                self.cursor = (self.doc.width(y - 1), y - 1)
         else:
-            self.cursor = (x - w, y)
+            x_, y_ = self._get_index(x, y)
+            w = _wcwidth.width(self._get_char_at(x_ - 1, y_)) if x_ > 0 else 0
+            self.cursor = (min(x, self.doc.width(y)) - w, y)
 
     def op_cursor_right(self):
         x, y = self.cursor
-        l = _wcwidth.width(self.lines[y])
+        l = self.doc.width(y)
 
         if x >= l:
-            if y != len(self.lines) - 1:
+            if y != len(self.doc) - 1:
                 self.cursor = (0, y + 1)
         else:
             self.cursor = (x + _wcwidth.width(self._get_char_at(*self._get_index(*self.cursor))), y)
@@ -935,6 +1590,30 @@ class WDebug(Widget):
         return False
 
 
+class WProfile(WLabel):
+    def __init__(self, locator: _Callable = lambda x, y: (0, 0), ms=500):
+        WLabel.__init__(self, '', locator)
+        self.timer = Timer(ms, self._update)
+
+    def on_canvas(self, canvas: Canvas) -> None:
+        super().on_canvas(canvas)
+        self.timer.reset()
+
+    def _update(self):
+        p = Window.INSTANCE.profiler
+        if p is None or len(p.history) == 0:
+            s = 'Profiler off'
+        else:
+            fs = p.history
+            s = 'Frame avg {:.1f}ms, max {:.1f}ms, {:.0f}B'.format(
+                sum(i.total for i in fs) / len(fs) * 1000, max(i.total for i in fs) * 1000,
+                sum(i.bytes for i in fs) / len(fs)
+            )
+            for k, v in p.slowest():
+                s += ', {:s} {:.1f}ms'.format(k, v * 1000)
+        self.set_str(s)
+
+
 class WWrapper(WContainer):
     def on_container(self, container):
         WBoundary.on_container(self, container)
@@ -959,7 +1638,11 @@ class WWrapper(WContainer):
         ))
 
     def on_draw(self) -> None:
-        self.widget.on_draw()
+        _draw(self.widget)
+        self.painter(self.canvas)
+
+    def on_repaint(self, rects) -> None:
+        _draw(self.widget, rects)
         self.painter(self.canvas)
 
     def on_refresh(self) -> None:
@@ -975,6 +1658,13 @@ class WWrapper(WContainer):
     def on_key(self, ch) -> bool:
         return self.widget.on_key(ch)
 
+    @property
+    def hotkeys(self):
+        return self.widget.hotkeys
+
+    def hotkeys_changed(self):
+        Widget.hotkeys_changed(self)
+
     def __init__(
             self, widget,
             locator: _Callable = lambda x, y: (0, 0),
@@ -1010,6 +1700,9 @@ class WWrapper(WContainer):
         self._widget = widget
         if self.container is not None and (self is self.container.focus and not w.on_unfocused(widget)):
             raise RuntimeError('Widget refuses to release focus.')
+        if self.container is not None:
+            self._widget.on_container(self)
+        self.hotkeys_changed()
 
         if Window.INSTANCE.state != Window.STATE_INIT:
             self._widget.on_layout(*self.xy_size)
@@ -1020,9 +1713,8 @@ class WWrapper(WContainer):
             c = self.canvas.canvas(
                 self.bl, self.bt, self.x_size - self.bl - self.bt, self.y_size - self.bt - self.bb, 0, 0
             )
-            c.clear()
             self._widget.on_canvas(c)
-            self._widget.on_draw()
+            Window.INSTANCE.damage(*c.rect)
             if self is self.container.focus:
                 self._widget.on_focused()
 
@@ -1036,107 +1728,499 @@ class WWrapper(WContainer):
         Window.INSTANCE.log("Do you really want to call this? I'm a wrapper.")
 
 
-class WSelect(WWrapper):
-    def __init__(self, locator, sizer, items: _typing.List[_typing.Tuple[str, _Callable]] = None):
+# rows are a fixed pool of buttons showing the items from top, source needs __len__ and __getitem__ giving (text, exe)
+class WList(WWrapper):
+    def __init__(
+            self, source: _typing.Sequence[_typing.Tuple[str, _Callable]] = (),
+            locator: _Callable = lambda x, y: (0, 0), sizer: _Callable = lambda x, y: (x, y)
+    ):
         WWrapper.__init__(self, WContainer(), locator, sizer)
-        self.items = items if items is not None else []
-        self.index = 0
-        self.list = []
+        self.source = source
+        self.top = 0
+        self.rows: _typing.List[WButton] = []
 
     def on_layout(self, x, y) -> None:
         super().on_layout(x, y)
-        self._arrange()
-
-    def _arrange(self):
-        x, y = self.xy_size
-        index = self.list.index(self.widget.focus) if self.widget.focus is not None else 0
-        self.widget.widget_clear()
-        self.list.clear()
-        for i in range(self.index, min(len(self.items), self.index + y)):
-            b = WButton(text=self.items[i][0], auto=False, width=x, exe=self.items[i][1],
-                        locator=lambda x_, y_: (0, i - self.index))
+        self.refresh()
+
+    # call after the length or items of source changed
+    def refresh(self):
+        n = min(self.y_size, len(self.source))
+        while len(self.rows) > n:
+            self.widget.widget_remove(self.rows.pop())
+        for i in self.rows:
+            i.width = i.pos_x = self.x_size
+        while len(self.rows) < n:
+            b = WButton('', auto=False, width=self.x_size, locator=lambda x_, y_, w_, r=len(self.rows): (0, r))
+            self.rows.append(b)
             self.widget.widget_add(b)
-            self.list.append(b)
-        self.widget.focus = self.list[min(len(self.list) - 1, index)]
+        self.top = max(0, min(self.top, len(self.source) - n))
+        self._fill()
+
+    # rows whose text changed are drawn in place
+    def _fill(self):
+        for n, i in enumerate(self.rows):
+            text, i.exe = self.source[self.top + n]
+            if i.text != text:
+                i.text = text
+                if i.canvas is not None and Window.INSTANCE.state == Window.STATE_SERVE:
+                    i.on_draw()
+
+    def scroll(self, top):
+        top = max(0, min(top, len(self.source) - len(self.rows)))
+        if top != self.top:
+            self.top = top
+            self._fill()
+
+    # index of the selected item, -1 if the list is not focused
+    @property
+    def selected(self) -> int:
+        f = self.widget.focus
+        return -1 if f is None else self.top + f.y_top
+
+    # select item n, wraps around the ends and scrolls as little as possible
+    def select(self, n):
+        if len(self.rows) == 0:
+            return
+        n %= len(self.source)
+        if n < self.top:
+            self.scroll(n)
+        elif n >= self.top + len(self.rows):
+            self.scroll(n - len(self.rows) + 1)
+        self.widget.focus = self.rows[n - self.top]
 
     def on_key(self, ch) -> bool:
         if super().on_key(ch):
             return True
 
-        if self.container.focus is self:
+        if self.container.focus is self and len(self.rows) > 0:
+            n = max(self.selected, self.top)
             if ch == _constants.Key.UP:
-                index = self.list.index(self.widget.focus)
-                if index == 0:
-                    if self.index > 0:
-                        self.index -= 1
-                        self._arrange()
-                        self.widget.focus = self.list[index]
-                        self.canvas.clear()
-                        self.on_draw()
-                        return True
-                    else:
-                        self.index = len(self.items) - self.y_size
-                        self._arrange()
-                        self.widget.focus = self.list[-1]
-                        self.canvas.clear()
-                        self.on_draw()
-                        return True
-                else:
-                    self.widget.focus = self.list[index - 1]
-                    return True
+                self.select(n - 1)
+                return True
             elif ch == _constants.Key.DOWN:
-                index = self.list.index(self.widget.focus)
-                if index == self.y_size - 1:
-                    if self.index + self.y_size < len(self.items):
-                        self.index += 1
-                        self._arrange()
-                        self.widget.focus = self.list[index]
-                        self.canvas.clear()
-                        self.on_draw()
-                        return True
-                    else:
-                        self.index = 0
-                        self._arrange()
-                        self.widget.focus = self.list[0]
-                        self.canvas.clear()
-                        self.on_draw()
-                        return True
-                else:
-                    self.widget.focus = self.list[index - len(self.list) + 1]
-                    return True
-            else:
-                return False
-        else:
+                self.select(n + 1)
+                return True
+        return False
+
+
+class WSelect(WList):
+    def __init__(self, locator, sizer, items: _typing.List[_typing.Tuple[str, _Callable]] = None):
+        WList.__init__(self, items if items is not None else [], locator, sizer)
+
+    @property
+    def items(self):
+        return self.source
+
+    @items.setter
+    def items(self, items):
+        self.source = items
+
+    @property
+    def index(self):
+        return self.top
+
+    @property
+    def list(self):
+        return self.rows
+
+
+# columns are sequences of cell strings as long as the first one, only cells on screen are read,
+# a column is as wide as the widest cell shown so far unless widths gives it
+# a view scrolled by keys once focused by a click, subclasses give scroll and the arguments it takes for each key
+class WScroll(WBoundary):
+    def scroll(self, *args):
+        raise NotImplementedError()
+
+    def _moves(self) -> _typing.Dict[_typing.Any, tuple]:
+        return {}
+
+    def _redraw(self):
+        w = Window.INSTANCE
+        if self.canvas is not None and w is not None and w.state == Window.STATE_SERVE:
+            self.on_draw()
+
+    def on_focused(self) -> bool:
+        return True
+
+    def on_mouse(self, x, y, state) -> bool:
+        if self.encloses(x, y):
+            if state == _constants.Button.B1_PRESSED:
+                self.container.focus = self
+            return True
+        return False
+
+    def on_key(self, ch) -> bool:
+        if self is not self.container.focus:
+            return False
+        m = self._moves().get(ch)
+        if m is None:
             return False
+        self.scroll(*m)
+        return True
+
+    # only takes keys when focused
+    @property
+    def hotkeys(self):
+        return ()
+
+
+class WTable(WScroll):
+    def __init__(
+            self, columns: _typing.Sequence[_typing.Sequence[str]], header: _typing.Sequence[str] = None,
+            widths: _typing.Sequence[int] = None,
+            locator: _Callable = lambda x, y: (0, 0), sizer: _Callable = lambda x, y: (x, y)
+    ):
+        super().__init__(locator, sizer)
+        self.columns = columns
+        self.header = header
+        self.widths = widths
+        # first row and first column on screen
+        self.top = 0
+        self.left = 0
+        self.style_header = _buffer.style(_constants.Attibute.BOLD)
+        self.style_body = _buffer.STYLE_DEFAULT
+        self._widths: _typing.List[int] = []
+        self.refresh()
+
+    @property
+    def rows(self) -> int:
+        return len(self.columns[0]) if len(self.columns) > 0 else 0
+
+    # rows of the body on screen
+    @property
+    def rows_shown(self) -> int:
+        return max(0, self.y_size - (1 if self.header is not None else 0))
+
+    # call after columns, header or widths changed, forgets the widths seen so far
+    def refresh(self):
+        for name, i in (('header', self.header), ('widths', self.widths)):
+            if i is not None and len(i) != len(self.columns):
+                raise ValueError('The WTable {} doesn\'t match its columns.'.format(name))
+        if self.widths is not None:
+            self._widths = list(self.widths)
+        elif self.header is not None:
+            self._widths = [_wcwidth.width(i) for i in self.header]
+        else:
+            self._widths = [0] * len(self.columns)
+        self.scroll(self.top, self.left)
+
+    def scroll(self, top=None, left=None):
+        top = self.top if top is None else max(0, min(top, self.rows - self.rows_shown))
+        left = self.left if left is None else max(0, min(left, len(self.columns) - 1))
+        self.top, self.left = top, left
+        self._redraw()
+
+    def on_layout(self, x, y) -> None:
+        super().on_layout(x, y)
+        self.top = max(0, min(self.top, self.rows - self.rows_shown))
+
+    def on_draw(self) -> None:
+        self.canvas.clear()
+        rows = range(self.top, min(self.top + self.rows_shown, self.rows))
+        # columns that fit, widths grow with the cells shown
+        cols, x = [], 0
+        for c in range(self.left, len(self.columns)):
+            if x >= self.x_size:
+                break
+            if self.widths is None:
+                column = self.columns[c]
+                self._widths[c] = max(self._widths[c], max((_wcwidth.width(column[r]) for r in rows), default=0))
+            cols.append(c)
+            x += self._widths[c] + 1
+
+        widths = [self._widths[c] + 1 for c in cols]
+        y = 0
+        if self.header is not None:
+            self.canvas.draw_grid([[self.header[c] for c in cols]], widths, self.style_header)
+            y = 1
+        # read column by column, draw row by row
+        cells = [[self.columns[c][r] for r in rows] for c in cols]
+        self.canvas.draw_grid(list(zip(*cells)), widths, self.style_body, y_top=y)
+
+    # arguments of scroll for each key
+    def _moves(self):
+        n = max(1, self.rows_shown)
+        return {
+            _constants.Key.UP: (self.top - 1, None), _constants.Key.DOWN: (self.top + 1, None),
+            _constants.Key.PPAGE: (self.top - n, None), _constants.Key.NPAGE: (self.top + n, None),
+            _constants.Key.LEFT: (None, self.left - 1), _constants.Key.RIGHT: (None, self.left + 1)
+        }
+
+
+# the last capacity lines, append may be called from any thread and lines pushed between frames are drawn once,
+# the view follows new lines unless scrolled up
+class WLog(WScroll):
+    def __init__(
+            self, capacity=10000,
+            locator: _Callable = lambda x, y: (0, 0), sizer: _Callable = lambda x, y: (x, y)
+    ):
+        super().__init__(locator, sizer)
+        self.lines: _typing.Deque[str] = _collections.deque(maxlen=capacity)
+        # (width, rows) of each line wrapped when it was last shown
+        self._wrapped: _typing.Deque[_Optional[_typing.Tuple[int, _typing.List[str]]]] = \
+            _collections.deque(maxlen=capacity)
+        self._pending: _typing.Deque[str] = _collections.deque(maxlen=capacity)
+        # lines below the bottom of the view, 0 when following
+        self.offset = 0
+        self.style = _buffer.STYLE_DEFAULT
+
+    def append(self, line: str):
+        self._pending.append(line)
+        w = Window.INSTANCE
+        if w is None:
+            self._drain()
+        else:
+            w.post(self._drain, self)
+
+    def extend(self, lines: _typing.Iterable[str]):
+        self._pending.extend(lines)
+        w = Window.INSTANCE
+        if w is None:
+            self._drain()
+        else:
+            w.post(self._drain, self)
+
+    # a target for Logger
+    def log(self, s, type_=0):
+        self.append(s)
+
+    def clear(self):
+        self.lines.clear()
+        self._wrapped.clear()
+        self.offset = 0
+        self._redraw()
+
+    def _drain(self):
+        n = 0
+        while len(self._pending) > 0:
+            self.lines.append(self._pending.popleft())
+            self._wrapped.append(None)
+            n += 1
+        if n == 0:
+            return
+        if self.offset > 0:
+            self.scroll(self.offset + n)
+        else:
+            self._redraw()
+
+    # at most so far that the oldest lines fill the view
+    def scroll(self, offset):
+        i = rows = 0
+        while i < len(self.lines) and rows < self.y_size:
+            rows += len(self._wrap(i))
+            i += 1
+        self.offset = max(0, min(offset, len(self.lines) - i))
+        self._redraw()
+
+    @property
+    def following(self) -> bool:
+        return self.offset == 0
+
+    def _wrap(self, i) -> _typing.List[str]:
+        w = self._wrapped[i]
+        if w is None or w[0] != self.x_size:
+            w = self._wrapped[i] = (self.x_size, _wcwidth.split(self.lines[i], self.x_size))
+        return w[1]
+
+    # rows on screen, only the lines shown are wrapped
+    def _rows(self) -> _typing.List[str]:
+        rows = []
+        i = len(self.lines) - 1 - self.offset
+        while i >= 0 and len(rows) < self.y_size:
+            rows.extend(reversed(self._wrap(i)))
+            i -= 1
+        return rows[self.y_size - 1::-1] if len(rows) >= self.y_size else rows[::-1]
+
+    def on_draw(self) -> None:
+        self.canvas.clear()
+        self.canvas.draw_runs((0, y, r, self.style) for y, r in enumerate(self._rows()))
+
+    def _moves(self):
+        n = max(1, self.y_size)
+        return {
+            _constants.Key.UP: (self.offset + 1,), _constants.Key.DOWN: (self.offset - 1,),
+            _constants.Key.PPAGE: (self.offset + n,), _constants.Key.NPAGE: (self.offset - n,),
+            _constants.Key.HOME: (len(self.lines),), _constants.Key.END: (0,)
+        }
 
 
 class WPager(WWrapper):
     # getter = callable: page (int) -> content (widget)
+    # the getter may also return an awaitable or a future, placeholder (int) -> widget is shown until it is done
+    # the last capacity pages are kept when buffered, pages within prefetch of the current one
+    # are got on executor (a shared thread by default) and getter must be safe to call there
     def __init__(
             self, getter: _Callable, page=0, size=-1, buffered=True,
             locator: _Callable = lambda x, y: (0, 0),
-            sizer: _Callable = lambda x, y: (x, y)
+            sizer: _Callable = lambda x, y: (x, y),
+            capacity=16, prefetch=0, executor: _futures.Executor = None,
+            placeholder: _Callable = lambda n: WLabel('Loading...')
     ):
         super().__init__(Widget(), locator, sizer)
         self.getter = getter
         self.page = page
         self.size = size
         self._buffered = buffered
-        self.buffer = {}
-        self.page_set(page)
+        self.capacity = capacity
+        self.prefetch = prefetch
+        self.executor = executor
+        self.placeholder = placeholder
+        self.buffer: _typing.Dict[int, Widget] = _collections.OrderedDict()
+        self._pending: _typing.Dict[int, _futures.Future] = {}
+        # requests put off until there is a window, and a loop for awaitables, None to call getter then
+        self._deferred: _typing.Dict[int, _typing.Any] = {}
+        self._range_check(page)
+        self._widget = self._show(page)
+        self._prefetch()
 
     def page_set(self, n):
         self._range_check(n)
         self.page = n
+        self._swap(self._show(n))
+        self._prefetch()
+
+    # widget for page n, the placeholder if it is not there yet
+    def _show(self, n) -> Widget:
+        w = self.buffer.get(n)
+        if w is not None:
+            if self.buffered:
+                self.buffer.move_to_end(n)
+            else:
+                del self.buffer[n]
+            return w
+        f = self._pending.get(n)
+        if f is not None:
+            if f.done() and not f.cancelled() and f.exception() is None and isinstance(f.result(), Widget):
+                del self._pending[n]
+                w = f.result()
+        elif n not in self._deferred:
+            if _inspect.iscoroutinefunction(self.getter) and not self._looping():
+                self._deferred[n] = None
+            else:
+                w = self.getter(n)
+                if not isinstance(w, Widget):
+                    self._request(n, w)
+                    w = None
+        if w is None:
+            return self.placeholder(n)
         if self.buffered:
-            w = self.buffer.get(n)
-            if w is not None:
-                self.widget = w
+            self.buffer[n] = w
+            self._trim()
+        return w
+
+    # the pager may not be on screen yet
+    def _swap(self, w):
+        if self.canvas is None and Window.INSTANCE is not None and Window.INSTANCE.state == Window.STATE_SERVE:
+            self._widget = w
+        else:
+            self.widget = w
+
+    @staticmethod
+    def _looping() -> bool:
+        return Window.INSTANCE is not None and Window.INSTANCE._loop is not None
+
+    # drop least recently shown pages, but never the current one,
+    # room is left for the prefetched ones or they would be dropped and got again
+    def _trim(self):
+        capacity = max(self.capacity, 2 * self.prefetch + 1)
+        for i in list(self.buffer):
+            if len(self.buffer) <= capacity:
+                break
+            if i != self.page:
+                del self.buffer[i]
+
+    def _prefetch(self):
+        near = set(i for i in range(self.page - self.prefetch, self.page + self.prefetch + 1)
+                   if i != self.page and i >= 0 and (self.size == -1 or i < self.size))
+        # requests of pages paged past are stale
+        for i in list(self._pending):
+            if i not in near and i != self.page:
+                self._pending.pop(i).cancel()
+        for i in list(self._deferred):
+            if i not in near and i != self.page:
+                r = self._deferred.pop(i)
+                if _inspect.iscoroutine(r):
+                    r.close()
+        for i in list(self.buffer):
+            if not self.buffered and i not in near:
+                del self.buffer[i]
+        for i in sorted(near, key=lambda i: abs(i - self.page)):
+            if i not in self.buffer and i not in self._pending and i not in self._deferred:
+                self._start(i)
+        self._resume()
+
+    def _start(self, n):
+        if Window.INSTANCE is None or (_inspect.iscoroutinefunction(self.getter) and not self._looping()):
+            self._deferred[n] = None
+        elif _inspect.iscoroutinefunction(self.getter):
+            self._request(n, self.getter(n))
+        else:
+            self._request(n, _executor(self.executor).submit(self.getter, n))
+
+    # start the requests that can be started now
+    def _resume(self):
+        for n, r in list(self._deferred.items()):
+            if Window.INSTANCE is None or (r is None or _inspect.isawaitable(r)) and not self._looping():
+                continue
+            del self._deferred[n]
+            if r is None:
+                self._start(n)
             else:
-                self.buffer[n] = self.getter(n)
-                self.widget = self.buffer[n]
+                self._request(n, r)
+
+    # r is an awaitable or a concurrent future, the page is handed over on the serving thread
+    def _request(self, n, r):
+        w = Window.INSTANCE
+        if _inspect.isawaitable(r):
+            if not self._looping():
+                self._deferred[n] = r
+                return
+            r = _asyncio.ensure_future(r, loop=w._loop)
+        elif not isinstance(r, _futures.Future):
+            raise TypeError('Getter returned neither a widget nor a future.')
+        elif w is None:
+            self._deferred[n] = r
+            return
+        self._pending[n] = r
+        r.add_done_callback(lambda f: w.post(lambda: self._fetched(n, f), (self, n)) if Window.INSTANCE is w else None)
+
+    # failed prefetches are got again when shown, a failed current page raises
+    def _fetched(self, n, f):
+        if self._pending.get(n) is not f:
+            return
+        del self._pending[n]
+        if f.cancelled():
+            return
+        if f.exception() is not None:
+            if n == self.page:
+                raise f.exception()
+            return
+        w = f.result()
+        if not isinstance(w, Widget):
+            self._request(n, w)
+        elif n == self.page:
+            if self.buffered:
+                self.buffer[n] = w
+                self._trim()
+            self._swap(w)
         else:
-            self.widget = self.getter(n)
+            self.buffer[n] = w
+            self._trim()
+
+    # requests put off before serving start with the first draw
+    def _drawn(self):
+        self._resume()
+        if len(self._deferred) > 0:
+            raise RuntimeError('Awaitable getters need Window.serve_async.')
+
+    def on_draw(self) -> None:
+        self._drawn()
+        super().on_draw()
+
+    def on_repaint(self, rects) -> None:
+        self._drawn()
+        super().on_repaint(rects)
 
     def page_prev(self):
         self.page_set(self.page - 1)
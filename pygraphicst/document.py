@@ -0,0 +1,224 @@
+import collections as _collections
+import typing as _typing
+
+import pygraphicst.wcwidth as _wcwidth
+
+
+# control characters count as zero columns, as in wcwidth.prefix which index goes by
+def _width(s: str) -> int:
+    if s.isprintable():
+        return _wcwidth.width(s)
+    return sum(max(w, 0) for w in _wcwidth.widths(s))
+
+
+# lines in a gap buffer around the active line, which is a gap buffer of chars itself,
+# so edits near the last one are O(1) amortized and line widths are kept up to date
+class Document:
+    def __init__(self, lines: _typing.Iterable[str] = ('',)):
+        # lines before the active one, and after it with the last line first
+        self._pre: _typing.List[str] = []
+        self._pre_w: _typing.List[int] = []
+        self._post = [i for i in lines][::-1]
+        self._post_w = [_width(i) for i in self._post]
+        if len(self._post) == 0:
+            self._post, self._post_w = [''], [0]
+        # chars of the active line before the gap, and after it with the last char first
+        self._left: _typing.List[str] = []
+        self._right: _typing.List[str] = []
+        self._left_w = 0
+        self._right_w = 0
+        self._text = None
+        # how many lines have each width, and the largest one, None when it has to be looked up
+        self._counts = _collections.Counter(self._post_w)
+        self._max_w = None
+        self._load(self._post.pop(), self._post_w.pop())
+
+    def __len__(self):
+        return len(self._pre) + 1 + len(self._post)
+
+    def __getitem__(self, n) -> str:
+        return self.line(n)
+
+    def __iter__(self) -> _typing.Iterator[str]:
+        yield from self._pre
+        yield self.line(len(self._pre))
+        yield from reversed(self._post)
+
+    def widths(self) -> _typing.Iterator[int]:
+        yield from self._pre_w
+        yield self._left_w + self._right_w
+        yield from reversed(self._post_w)
+
+    def max_width(self) -> int:
+        if self._max_w is None:
+            self._max_w = max(self._counts)
+        return self._max_w
+
+    def _count(self, w, n):
+        c = self._counts
+        c[w] += n
+        if c[w] <= 0:
+            del c[w]
+            if w == self._max_w:
+                self._max_w = None
+        elif self._max_w is not None and w > self._max_w:
+            self._max_w = w
+
+    # count the new width of the active line
+    def _recount(self, w):
+        w_ = self._left_w + self._right_w
+        if w_ != w:
+            self._count(w, -1)
+            self._count(w_, 1)
+
+    @property
+    def text(self) -> str:
+        return '\n'.join(self)
+
+    def _check(self, n):
+        if not 0 <= n < len(self):
+            raise IndexError('Line index out of range.')
+
+    # make s the active line, gap at its end
+    def _load(self, s, w):
+        self._left = list(s)
+        self._left_w = w
+        self._right = []
+        self._right_w = 0
+        self._text = s
+
+    # make line n the active one
+    def _focus(self, n):
+        a = len(self._pre)
+        if n == a:
+            return
+        s, w = self.line(a), self._left_w + self._right_w
+        if n > a:
+            self._pre.append(s)
+            self._pre_w.append(w)
+            for _ in range(n - a - 1):
+                self._pre.append(self._post.pop())
+                self._pre_w.append(self._post_w.pop())
+            self._load(self._post.pop(), self._post_w.pop())
+        else:
+            self._post.append(s)
+            self._post_w.append(w)
+            for _ in range(a - n - 1):
+                self._post.append(self._pre.pop())
+                self._post_w.append(self._pre_w.pop())
+            self._load(self._pre.pop(), self._pre_w.pop())
+
+    # move the char gap of the active line to index x
+    def _gap(self, x):
+        n = len(self._left)
+        if x < n:
+            moved = self._left[x:]
+            del self._left[x:]
+            self._right.extend(reversed(moved))
+            w = _width(''.join(moved))
+            self._left_w -= w
+            self._right_w += w
+        elif x > n:
+            k = x - n
+            if k > len(self._right):
+                raise IndexError('Char index out of range.')
+            moved = self._right[-k:][::-1]
+            del self._right[-k:]
+            self._left.extend(moved)
+            w = _width(''.join(moved))
+            self._left_w += w
+            self._right_w -= w
+
+    def line(self, n) -> str:
+        a = len(self._pre)
+        if 0 <= n < a:
+            return self._pre[n]
+        elif n == a:
+            if self._text is None:
+                self._text = ''.join(self._left) + ''.join(reversed(self._right))
+            return self._text
+        else:
+            self._check(n)
+            return self._post[len(self._post) - n + a]
+
+    def width(self, n) -> int:
+        a = len(self._pre)
+        if 0 <= n < a:
+            return self._pre_w[n]
+        elif n == a:
+            return self._left_w + self._right_w
+        else:
+            self._check(n)
+            return self._post_w[len(self._post) - n + a]
+
+    # char index at column x of line n, or its length if x is past the end
+    def index(self, n, x, left=True) -> int:
+        # at the gap unless zero width chars follow it, which the index skips
+        if n == len(self._pre) and x == self._left_w and (
+                len(self._right) == 0 or _wcwidth.widths(self._right[-1])[0] > 0):
+            return len(self._left)
+        s = self.line(n)
+        i, _ = _wcwidth.index(s, x, left)
+        return i if i != -1 else len(s)
+
+    # column where char index i of line n starts
+    def column(self, n, i) -> int:
+        if n == len(self._pre) and i == len(self._left):
+            return self._left_w
+        return _width(self.line(n)[:i])
+
+    # insert s at char index x of line n, new lines in s split the line
+    def insert(self, n, x, s: str):
+        parts = s.split('\n')
+        for i, p in enumerate(parts):
+            if i > 0:
+                self.split(n, x)
+                n, x = n + 1, 0
+            self._check(n)
+            self._focus(n)
+            self._gap(x)
+            w = self._left_w + self._right_w
+            self._left.extend(p)
+            self._left_w += _width(p)
+            self._text = None
+            self._recount(w)
+            x += len(p)
+
+    # delete chars [x, x + length) of line n
+    def delete(self, n, x, length=1):
+        self._check(n)
+        self._focus(n)
+        self._gap(x + length)
+        w = self._left_w + self._right_w
+        moved = self._left[x:]
+        del self._left[x:]
+        self._left_w -= _width(''.join(moved))
+        self._text = None
+        self._recount(w)
+
+    # break line n at char index x
+    def split(self, n, x):
+        self._check(n)
+        self._focus(n)
+        self._gap(x)
+        w = self._left_w + self._right_w
+        self._post.append(''.join(reversed(self._right)))
+        self._post_w.append(self._right_w)
+        self._count(self._right_w, 1)
+        self._right = []
+        self._right_w = 0
+        self._text = None
+        self._recount(w)
+
+    # append line n + 1 to line n
+    def join(self, n):
+        self._check(n + 1)
+        self._focus(n)
+        self._gap(len(self._left) + len(self._right))
+        w = self._left_w + self._right_w
+        self._left.extend(self._post.pop())
+        w_ = self._post_w.pop()
+        self._left_w += w_
+        self._count(w_, -1)
+        self._text = None
+        self._recount(w)
@@ -0,0 +1,77 @@
+import collections as _collections
+import time as _time
+import typing as _typing
+
+PHASES = ('posts', 'input', 'layout', 'timers', 'refresh', 'draw', 'flush')
+
+
+class Frame:
+    def __init__(self):
+        # seconds spent in each phase
+        self.times = dict.fromkeys(PHASES, 0.0)
+        self.total = 0.0
+        # addstr calls, doupdate calls and bytes sent to the terminal
+        self.writes = 0
+        self.refreshes = 0
+        self.bytes = 0
+
+    def __repr__(self):
+        phases = ' '.join('{:s}={:.2f}'.format(k, v * 1000) for k, v in self.times.items() if v > 0)
+        return 'Frame({:.2f}ms {:s} writes={:d} bytes={:d})'.format(self.total * 1000, phases, self.writes, self.bytes)
+
+
+class Profiler:
+    def __init__(self, history=120, clock: _typing.Callable[[], float] = _time.perf_counter):
+        self.clock = clock
+        self.history: _typing.Deque[Frame] = _collections.deque(maxlen=history)
+        self.frame = Frame()
+        self.frames = 0
+        # exclusive draw seconds and draw count of each widget class
+        self.widgets: _typing.Dict[str, float] = _collections.defaultdict(float)
+        self.draws: _typing.Dict[str, int] = _collections.defaultdict(int)
+        self._start = None
+        self._stack = []
+
+    def begin(self):
+        if self._start is None:
+            self._start = self.clock()
+
+    def end(self):
+        if self._start is None:
+            return
+        self.frame.total = self.clock() - self._start
+        self._start = None
+        self.history.append(self.frame)
+        self.frame = Frame()
+        self.frames += 1
+
+    def add(self, phase, seconds):
+        self.frame.times[phase] += seconds
+
+    def write(self, text: str):
+        self.frame.writes += 1
+        self.frame.bytes += len(text.encode())
+
+    def refresh(self):
+        self.frame.refreshes += 1
+
+    # time spent in widgets drawn inside this one is not counted for it
+    def widget_enter(self, widget):
+        self._stack.append([type(widget).__name__, self.clock(), 0.0])
+
+    def widget_exit(self):
+        name, start, inner = self._stack.pop()
+        t = self.clock() - start
+        self.widgets[name] += t - inner
+        self.draws[name] += 1
+        if len(self._stack) > 0:
+            self._stack[-1][2] += t
+
+    def slowest(self, n=3) -> _typing.List[_typing.Tuple[str, float]]:
+        return sorted(self.widgets.items(), key=lambda i: i[1], reverse=True)[:n]
+
+    def reset(self):
+        self.history.clear()
+        self.widgets.clear()
+        self.draws.clear()
+        self.frames = 0
@@ -0,0 +1,71 @@
+import heapq as _heapq
+import itertools as _itertools
+import time as _time
+import typing as _typing
+
+
+class Handle:
+    __slots__ = ('deadline', 'exe', 'cancelled', '_scheduler')
+
+    def __init__(self, scheduler: 'Scheduler', deadline: float, exe: _typing.Callable):
+        self.deadline = deadline
+        self.exe = exe
+        self.cancelled = False
+        self._scheduler = scheduler
+
+    def cancel(self):
+        if not self.cancelled:
+            self.cancelled = True
+            self._scheduler._cancel()
+
+
+class Scheduler:
+    # on_change is called when a call becomes the earliest one
+    def __init__(self, clock: _typing.Callable[[], float] = _time.monotonic, on_change: _typing.Callable = None):
+        self.clock = clock
+        self.on_change = on_change
+        self._heap = []
+        self._seq = _itertools.count()
+        self._cancelled = 0
+
+    def call_at(self, deadline: float, exe: _typing.Callable) -> Handle:
+        h = Handle(self, deadline, exe)
+        first = len(self._heap) == 0 or deadline < self._heap[0][0]
+        _heapq.heappush(self._heap, (deadline, next(self._seq), h))
+        if first and self.on_change is not None:
+            self.on_change()
+        return h
+
+    def call_later(self, delay: float, exe: _typing.Callable) -> Handle:
+        return self.call_at(self.clock() + delay, exe)
+
+    def _cancel(self):
+        self._cancelled += 1
+        # drop cancelled entries once they make up most of the heap
+        if self._cancelled * 2 > len(self._heap):
+            self._heap = [i for i in self._heap if not i[2].cancelled]
+            _heapq.heapify(self._heap)
+            self._cancelled = 0
+
+    # deadline of the earliest pending call, None if there is none
+    def next(self) -> _typing.Optional[float]:
+        while len(self._heap) > 0 and self._heap[0][2].cancelled:
+            _heapq.heappop(self._heap)
+            self._cancelled -= 1
+        return self._heap[0][0] if len(self._heap) > 0 else None
+
+    # run every call that is due, return how many ran
+    def run(self) -> int:
+        n = 0
+        t = self.clock()
+        while True:
+            d = self.next()
+            if d is None or d > t:
+                return n
+            _, _, h = _heapq.heappop(self._heap)
+            h.cancelled = True
+            h.exe()
+            n += 1
+
+    def __len__(self):
+        return len(self._heap) - self._cancelled
@@ -2,18 +2,96 @@
 #include <wchar.h>
 #include <locale.h>
 
-static PyObject *wcwidth_wcwidth(PyObject *self, PyObject *args)
+// width + 2 of each BMP codepoint, 0 while not looked up yet
+static signed char wcwidth_table[0x10000];
+
+static inline int wcwidth_cached(Py_UCS4 c)
+{
+    signed char w;
+
+    if (c >= 0x10000)
+        return wcwidth((wchar_t) c);
+    w = wcwidth_table[c];
+    if (w == 0) {
+        w = (signed char) (wcwidth((wchar_t) c) + 2);
+        wcwidth_table[c] = w;
+    }
+    return w - 2;
+}
+
+static int wcwidth_ready(PyObject *str)
+{
+    if (!PyUnicode_Check(str)) {
+        PyErr_SetString(PyExc_TypeError, "Argument is not a string");
+        return -1;
+    }
+#if PY_VERSION_HEX < 0x030C0000
+    if (PyUnicode_READY(str) < 0)
+        return -1;
+#endif
+    return 0;
+}
+
+static PyObject *wcwidth_wcwidth(PyObject *self, PyObject *str)
+{
+    if (wcwidth_ready(str) < 0)
+        return NULL;
+    if (PyUnicode_GET_LENGTH(str) == 0) {
+        PyErr_SetString(PyExc_ValueError, "Empty string");
+        return NULL;
+    }
+
+    return PyLong_FromLong(wcwidth_cached(PyUnicode_READ_CHAR(str, 0)));
+}
+
+static PyObject *wcwidth_wcswidth(PyObject *self, PyObject *str)
+{
+    Py_ssize_t i, n;
+    int kind;
+    const void *data;
+    long l = 0;
+
+    if (wcwidth_ready(str) < 0)
+        return NULL;
+
+    n = PyUnicode_GET_LENGTH(str);
+    kind = PyUnicode_KIND(str);
+    data = PyUnicode_DATA(str);
+    for (i = 0; i < n; i++)
+        l += wcwidth_cached(PyUnicode_READ(kind, data, i));
+
+    return PyLong_FromLong(l);
+}
+
+// widths as signed bytes, read them through memoryview(...).cast('b')
+static PyObject *wcwidth_wcwidths(PyObject *self, PyObject *str)
 {
-    const Py_UNICODE *command;
+    Py_ssize_t i, n;
+    int kind;
+    const void *data;
+    PyObject *ret;
+    char *buf;
 
-    if (!PyArg_ParseTuple(args, "u", &command))
+    if (wcwidth_ready(str) < 0)
         return NULL;
 
-    return PyLong_FromLong(wcwidth(command[0]));
+    n = PyUnicode_GET_LENGTH(str);
+    kind = PyUnicode_KIND(str);
+    data = PyUnicode_DATA(str);
+    ret = PyBytes_FromStringAndSize(NULL, n);
+    if (ret == NULL)
+        return NULL;
+    buf = PyBytes_AS_STRING(ret);
+    for (i = 0; i < n; i++)
+        buf[i] = (char) wcwidth_cached(PyUnicode_READ(kind, data, i));
+
+    return ret;
 }
 
 static PyMethodDef wcwidth_methods[] = {
-    {"wcwidth",  wcwidth_wcwidth, METH_VARARGS, "Get width of a wchar."},
+    {"wcwidth",  wcwidth_wcwidth, METH_O, "Get width of a wchar."},
+    {"wcswidth",  wcwidth_wcswidth, METH_O, "Get width of a string."},
+    {"wcwidths",  wcwidth_wcwidths, METH_O, "Get width of each wchar in a string as signed bytes."},
     {NULL, NULL, 0, NULL}
 };
 
@@ -29,4 +107,4 @@ PyMODINIT_FUNC PyInit__wcwidth(void)
 {
     setlocale(LC_ALL, "");
     return PyModule_Create(&wcwidth_module);
-}
\ No newline at end of file
+}
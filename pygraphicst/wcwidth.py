@@ -1,39 +1,112 @@
-# noinspection PyProtectedMember
-import pygraphicst._wcwidth as _w
+import bisect as _bisect
+import itertools as _itertools
+import unicodedata as _unicodedata
+
+try:
+    # noinspection PyProtectedMember
+    import pygraphicst._wcwidth as _w
+except ImportError:
+    _w = None
+
+# width of each codepoint, filled on first lookup when the extension is absent
+_table = {chr(i): 1 if 32 <= i < 127 else (0 if i == 0 else -1) for i in range(128)}
+
+
+def _wcwidth(c: str) -> int:
+    o = ord(c)
+    if o < 0xa0:
+        return 1 if 32 <= o < 0x7f else (0 if o == 0 else -1)
+    if 0x1160 <= o < 0x1200 or o == 0x200b:
+        return 0
+    cat = _unicodedata.category(c)
+    if cat in ('Mn', 'Me') or (cat == 'Cf' and o != 0xad):
+        return 0
+    if cat in ('Cc', 'Cs', 'Cn'):
+        return -1
+    return 2 if _unicodedata.east_asian_width(c) in ('W', 'F') else 1
+
+
+def _lookup(c: str) -> int:
+    w = _table.get(c)
+    if w is None:
+        w = _table[c] = _wcwidth(c)
+    return w
+
+
+def narrow(s: str) -> bool:
+    # printable ascii and latin-1 strings are one column per character
+    return s.isprintable() and (s.isascii() or max(s) < '\u0100')
 
 
 def width(c: str):
     if not isinstance(c, str):
         raise TypeError('Argument is not a string')
 
-    l = 0
-    for i in c:
-        l += _w.wcwidth(i)
-    return l
+    if narrow(c):
+        return len(c)
+    elif _w is not None:
+        return _w.wcswidth(c)
+    else:
+        return sum(map(_lookup, c))
+
+
+def widths(s: str):
+    if _w is not None:
+        return memoryview(_w.wcwidths(s)).cast('b')
+    else:
+        return [_lookup(i) for i in s]
+
+
+# p[i] is the width of s[:i], control characters count as zero so it stays sorted
+def prefix(s: str):
+    ws = widths(s)
+    if len(ws) > 0 and min(ws) < 0:
+        ws = [max(w, 0) for w in ws]
+    p = [0]
+    p.extend(_itertools.accumulate(ws))
+    return p
 
 
-def index(s: str, to, left) -> (int, int):
-    l = 0
-    for i in range(len(s)):
-        w = width(s[i])
-        l += w
-        if l > to:
-            if left or l - w == to:
-                return i, to + w - l
-            else:
-                return i + 1, l - to
-    return -1, to - l
+def _index(p, to, left, start=0) -> (int, int):
+    base = p[start]
+    j = _bisect.bisect_right(p, base + to, start + 1)
+    if j == len(p):
+        return -1, to - p[-1] + base
+    i = j - 1
+    if left or p[i] - base == to:
+        return i, to - p[i] + base
+    else:
+        return j, p[j] - base - to
+
+
+def index(s: str, to, left, ps=None) -> (int, int):
+    if ps is not None:
+        return _index(ps, to, left)
+    elif narrow(s):
+        n = len(s)
+        if n == 0 or to >= n:
+            return -1, to - n
+        elif to >= 0:
+            return to, 0
+        else:
+            return (0, to) if left else (1, 1 - to)
+    return _index(prefix(s), to, left)
 
 
-def slise(s: str, start, length=-1) -> str:
-    i, p = index(s, start, False)
+def slise(s: str, start, length=-1, ps=None) -> str:
+    if ps is None:
+        if start >= 0 and narrow(s):
+            return s[start:] if length < 0 else s[start:start + length]
+        ps = prefix(s)
+    i, p = _index(ps, start, False)
     if i != -1:
-        s = p * ' ' + s[i:]
         if length < 0:
-            return s
+            return p * ' ' + s[i:]
+        elif length < p:
+            return length * ' '
         else:
-            i, _ = index(s, length, True)
-            return s if i == -1 else s[:i]
+            j, _ = _index(ps, length - p, True, i)
+            return p * ' ' + (s[i:] if j == -1 else s[i:j])
     else:
         return ''
 
@@ -43,15 +116,21 @@ def split(s, length=-1):
         if length < 0:
             return [s_]
         else:
+            if narrow(s_):
+                n = max(length, 1)
+                return [s_[i_:i_ + n] for i_ in range(0, max(len(s_), 1), n)]
             ret_ = []
+            ps = prefix(s_)
+            a = 0
             while True:
-                i_, _ = index(s_, length, True)
+                i_, _ = _index(ps, length, True, a)
                 if i_ == -1:
-                    ret_.append(s_)
+                    ret_.append(s_[a:])
                     return ret_
                 else:
-                    ret_.append(s_[:i_])
-                    s_ = s_[i_:]
+                    i_ = max(i_, a + 1)
+                    ret_.append(s_[a:i_])
+                    a = i_
 
     def spl_dirty(s_: str):
         ret_ = []
@@ -0,0 +1,357 @@
+import argparse
+import json
+import os
+import re
+import statistics
+import sys
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import pygraphicst as gpx
+import pygraphicst.buffer as buffer
+import pygraphicst.wcwidth as wcwidth
+from pygraphicst.backend import HeadlessBackend
+
+# the timings saved here only hold on the machine that saved them, save a baseline with -s
+# before comparing changes on another machine
+BASELINE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'bench_baseline.json')
+
+CORPUS = {
+    'ascii': 'The quick brown fox jumps over the lazy dog, then naps in the sun. ' * 4,
+    'cjk': '黑龙江凯撒酱立刻到工具栏可视角度复合控件口脚镣手铐甲胺磷圣诞节风口浪尖撒离开家岛风' * 3,
+    'mixed': 'Hello 世界, layout テキスト with wide 字符 and narrow chars mixed. ' * 3,
+}
+
+CASES = {}
+
+
+# a case builds its fixture in the window and returns the operation to time
+def case(name):
+    def f(setup):
+        CASES[name] = setup
+        return setup
+
+    return f
+
+
+def text_cases():
+    for k, s in CORPUS.items():
+        w = wcwidth.width(s)
+        case('wcwidth.width.' + k)(lambda _, s=s: lambda: wcwidth.width(s))
+        case('wcwidth.index.' + k)(lambda _, s=s, w=w: lambda: wcwidth.index(s, w // 2, True))
+        case('wcwidth.slise.' + k)(lambda _, s=s, w=w: lambda: wcwidth.slise(s, w // 3, 40))
+        case('wcwidth.split.' + k)(lambda _, s=s: lambda: wcwidth.split(s, 40))
+
+
+text_cases()
+
+
+def serve(window, widgets, focus=None):
+    i = gpx.WInterface(None)
+    for w in widgets:
+        i.widget_add(w)
+    window.interface = i
+    # one pass of the loop lays out and attaches canvases
+    window.serve(lambda: False)
+    if focus is not None:
+        i.focus = focus
+    return i
+
+
+# time the repaint and flush of the frame too
+def frame(window, f):
+    def g():
+        f()
+        window.flush()
+
+    return g
+
+
+@case('draw_str.wrap')
+def _(window):
+    i = serve(window, [])
+    s = CORPUS['mixed'] * 4
+    return lambda: i.canvas.draw_str(s, x_left=3, y_top=2)
+
+
+@case('draw_str.nowrap')
+def _(window):
+    i = serve(window, [])
+    s = CORPUS['mixed']
+    return lambda: i.canvas.draw_str(s, x_left=3, y_top=2, wrap=False)
+
+
+@case('draw_str.styled')
+def _(window):
+    i = serve(window, [])
+    s = CORPUS['ascii'][:40]
+    style = buffer.style(gpx.constants.Attibute.BOLD, gpx.constants.Color.CYAN)
+    return lambda: i.canvas.draw_str(s, x_left=3, y_top=2, wrap=False, style=style)
+
+
+GRID = [['{:d}:{:d}'.format(r, c) for c in range(12)] for r in range(40)]
+
+
+@case('grid.draw_str')
+def _(window):
+    i = serve(window, [])
+
+    def f():
+        for r, row in enumerate(GRID):
+            for c, s in enumerate(row):
+                i.canvas.draw_str(s.ljust(10), x_left=c * 10, y_top=r, wrap=False)
+
+    return f
+
+
+@case('grid.draw_grid')
+def _(window):
+    i = serve(window, [])
+    widths = [10] * 12
+    return lambda: i.canvas.draw_grid(GRID, widths)
+
+
+def tree_deep(depth):
+    root = c = gpx.WContainer()
+    for _ in range(depth):
+        n = gpx.WContainer()
+        c.widget_add(n)
+        c = n
+    c.widget_add(gpx.WLabel('leaf'))
+    return root
+
+
+def tree_wide(width):
+    root = gpx.WContainer()
+    for n in range(width):
+        root.widget_add(gpx.WButton(str(n), keys=[], locator=lambda x, y, w, n=n: (n % 10 * 8, n // 10 % 30)))
+    return root
+
+
+@case('dispatch.key.deep')
+def _(window):
+    i = serve(window, [tree_deep(64)])
+    return lambda: i.on_key('x')
+
+
+@case('dispatch.key.wide')
+def _(window):
+    i = serve(window, [tree_wide(500)])
+    return lambda: i.on_key('x')
+
+
+@case('dispatch.mouse.deep')
+def _(window):
+    i = serve(window, [tree_deep(64)])
+    return lambda: i.on_mouse(100, 35, gpx.constants.Button.B1_PRESSED)
+
+
+@case('dispatch.mouse.wide')
+def _(window):
+    i = serve(window, [tree_wide(500)])
+    return lambda: i.on_mouse(100, 35, gpx.constants.Button.B1_PRESSED)
+
+
+@case('layout.resize')
+def _(window):
+    panels = []
+    for n in range(10):
+        # half of the panels stay put on resize, the others follow the right edge
+        p = gpx.WContainer(lambda x, y, n=n: (0 if n % 2 == 0 else x - 40, n * 4), lambda x, y: (40, 4))
+        for m in range(40):
+            p.widget_add(gpx.WButton('b', locator=lambda x, y, w, m=m: (m % 10 * 4, m // 10)))
+        panels.append(p)
+    serve(window, panels)
+    backend = window.backend
+
+    def f():
+        backend.x_size = 220 - backend.x_size
+        window.serve(lambda: False)
+
+    return frame(window, f)
+
+
+@case('wtext.insert')
+def _(window):
+    t = gpx.WText(sizer=lambda x, y: (x, y))
+    t.lines = [CORPUS['mixed'][:60]] * 5000
+    serve(window, [t], t)
+    t.cursor = (30, 2500)
+    t._cursor_refresh()
+
+    def f():
+        t.on_key('a')
+        t.on_key(chr(127))
+
+    return frame(window, f)
+
+
+@case('wselect.scroll')
+def _(window):
+    items = [('item {:d}'.format(n), lambda: ()) for n in range(10000)]
+    s = gpx.WSelect(lambda x, y: (0, 0), lambda x, y: (30, 20), items)
+    serve(window, [s], s)
+    return frame(window, lambda: s.on_key(gpx.constants.Key.DOWN))
+
+
+# rows are made on demand, nothing is stored per item
+class Rows:
+    def __len__(self):
+        return 1000000
+
+    def __getitem__(self, n):
+        return 'row {:d}'.format(n), lambda: ()
+
+
+@case('wlist.scroll')
+def _(window):
+    s = gpx.WList(Rows(), sizer=lambda x, y: (30, 20))
+    serve(window, [s], s)
+    s.select(500000)
+    return frame(window, lambda: s.on_key(gpx.constants.Key.DOWN))
+
+
+class Column:
+    def __init__(self, f):
+        self.f = f
+
+    def __len__(self):
+        return 1000000
+
+    def __getitem__(self, n):
+        return self.f(n)
+
+
+@case('wtable.scroll')
+def _(window):
+    columns = [Column(str), Column(lambda n: 'name {:d}'.format(n % 97)), Column(lambda n: '{:.3f}'.format(n / 7))] * 4
+    t = gpx.WTable(columns, header=['id', 'name', 'value'] * 4)
+    serve(window, [t], t)
+    t.scroll(500000)
+    return frame(window, lambda: t.on_key(gpx.constants.Key.DOWN))
+
+
+@case('wlog.append')
+def _(window):
+    log = gpx.WLog(capacity=10000)
+    serve(window, [log])
+    for n in range(10000):
+        log.append('warming up {:d}'.format(n))
+    line = CORPUS['mixed']
+
+    # a burst of lines between two frames, then the loop runs the posted redraw
+    def f():
+        for _ in range(100):
+            log.append(line)
+        window._drain()
+
+    return frame(window, f)
+
+
+@case('wpager.page')
+def _(window):
+    p = gpx.WPager(lambda n: gpx.WLabel('page {:d}'.format(n)), size=1000, buffered=False)
+    serve(window, [p])
+
+    def f():
+        p.page_set((p.page + 1) % p.size)
+
+    return frame(window, f)
+
+
+def measure(op, seconds, repeats):
+    op()
+
+    # batches of at least 10ms
+    n = 1
+    while True:
+        t = time.perf_counter()
+        for _ in range(n):
+            op()
+        t = time.perf_counter() - t
+        if t >= 0.01:
+            break
+        n *= 2
+    # the median batch of those run in seconds, so one slow or lucky batch does not decide
+    times = []
+    end = time.perf_counter() + seconds
+    while len(times) < repeats or time.perf_counter() < end:
+        t = time.perf_counter()
+        for _ in range(n):
+            op()
+        times.append(time.perf_counter() - t)
+
+    tracemalloc.start()
+    try:
+        base = tracemalloc.get_traced_memory()[0]
+        op()
+        peak = tracemalloc.get_traced_memory()[1] - base
+    finally:
+        tracemalloc.stop()
+
+    return {'ops': n / statistics.median(times), 'peak': max(0, peak)}
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description='Headless benchmarks of PyGraphicsT. Timings vary between machines, '
+                    'compare with a baseline saved on the same one.')
+    parser.add_argument('pattern', nargs='?', default='', help='only run cases matching this regex')
+    parser.add_argument('-t', '--time', type=float, default=0.1, help='seconds spent on each case in a round')
+    parser.add_argument('-r', '--repeats', type=int, default=5, help='batches timed on each case in a round at least')
+    parser.add_argument('-n', '--rounds', type=int, default=5, help='rounds over all cases')
+    parser.add_argument('-b', '--baseline', default=BASELINE, help='baseline file to compare with')
+    parser.add_argument('-s', '--save', action='store_true', help='write the results to the baseline file')
+    parser.add_argument('--tolerance', type=float, default=0.3, help='allowed slowdown or memory growth')
+    parser.add_argument('--strict', action='store_true', help='exit with 1 if a case regressed')
+    args = parser.parse_args()
+
+    try:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+    except FileNotFoundError:
+        baseline = {}
+
+    names = [i for i in CASES if re.search(args.pattern, i)]
+    # every case once in each round, so a slow spell of the machine hits one round of them, not all of one case
+    rounds = {i: [] for i in names}
+    for _ in range(args.rounds):
+        for name in names:
+            with gpx.Window(backend=HeadlessBackend(120, 40)) as window:
+                rounds[name].append(measure(CASES[name](window), args.time, args.repeats))
+
+    results = {}
+    failed = []
+    print('{:24s} {:>12s} {:>8s} {:>10s} {:>8s}'.format('case', 'ops/s', 'vs base', 'peak B', 'vs base'))
+    for name in names:
+        r = results[name] = {
+            'ops': statistics.median(i['ops'] for i in rounds[name]),
+            'peak': max(i['peak'] for i in rounds[name])
+        }
+        b = baseline.get(name)
+        if b is None:
+            print('{:24s} {:12.0f} {:>8s} {:10d} {:>8s}'.format(name, r['ops'], '-', r['peak'], '-'))
+            continue
+        speed = r['ops'] / b['ops']
+        mem = (r['peak'] + 1) / (b['peak'] + 1)
+        bad = speed < 1 - args.tolerance or (mem > 1 + args.tolerance and r['peak'] - b['peak'] > 256)
+        if bad:
+            failed.append(name)
+        print('{:24s} {:12.0f} {:7.2f}x {:10d} {:7.2f}x{:s}'.format(
+            name, r['ops'], speed, r['peak'], mem, '  REGRESSION' if bad else ''))
+
+    if args.save:
+        baseline.update({k: {'ops': round(v['ops']), 'peak': v['peak']} for k, v in results.items()})
+        with open(args.baseline, 'w') as f:
+            json.dump(baseline, f, indent=2, sort_keys=True)
+            f.write('\n')
+    elif len(failed) > 0:
+        print('Regressed: ' + ', '.join(failed))
+        if args.strict:
+            sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
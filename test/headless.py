@@ -0,0 +1,53 @@
+import os
+import sys
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import pygraphicst as gpx
+from pygraphicst.backend import HeadlessBackend
+
+
+# a test with one window on a headless backend at a time, closed even if the test or setUp fails
+class HeadlessCase(unittest.TestCase):
+    backend: HeadlessBackend = None
+    window: gpx.Window = None
+    interface: gpx.WInterface = None
+
+    # a new window, the one before is closed
+    def open(self, x_size=40, y_size=12):
+        self.close()
+        self.backend = HeadlessBackend(x_size, y_size)
+        self.window = gpx.Window(lambda *a: None, backend=self.backend)
+        self.window.__enter__()
+        self.addCleanup(self.close)
+
+    # lay out and draw widgets, in a new window unless one is open, containers can only take widgets then
+    def show(self, *widgets, x_size=40, y_size=12, focus=None):
+        if self.window is None or gpx.Window.INSTANCE is not self.window:
+            self.open(x_size, y_size)
+        self.interface = gpx.WInterface(None)
+        for i in widgets:
+            self.interface.widget_add(i)
+        self.window.interface = self.interface
+        self.window.serve(lambda: False)
+        if focus is not None:
+            self.interface.focus = focus
+        self.window.flush()
+
+    def close(self):
+        if self.window is not None and gpx.Window.INSTANCE is self.window:
+            self.window.__exit__(None, None, None)
+
+    # run posts and flush, the screen as text
+    def frame(self):
+        self.window.serve(lambda: False)
+        self.window.flush()
+        return self.backend.lines()
+
+    # handle keys now, then show the frame
+    def press(self, *keys):
+        t = self.backend.time
+        self.backend.feed(*keys)
+        self.window.serve(lambda: self.backend.time <= t)
+        return self.frame()
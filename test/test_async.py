@@ -0,0 +1,174 @@
+import asyncio
+import collections
+import socket
+import threading
+import unittest
+
+from headless import HeadlessCase
+
+import pygraphicst as gpx
+
+
+class AsyncCase(HeadlessCase):
+    def setUp(self):
+        self.label = gpx.WLabel('idle', lambda x, y: (0, 0))
+
+    # run test while the window serves on asyncio
+    def serve(self, test):
+        async def main():
+            task = asyncio.ensure_future(self.window.serve_async(lambda: True))
+            try:
+                await asyncio.sleep(0.01)
+                await test()
+            finally:
+                task.cancel()
+                try:
+                    await task
+                except asyncio.CancelledError:
+                    pass
+
+        asyncio.run(main())
+
+    def line(self):
+        return self.backend.lines()[0]
+
+
+# draws made away from input, posts and timers must still reach the screen under serve_async
+class TestServeAsync(AsyncCase):
+    def test_socket(self):
+        self.show(self.label)
+
+        async def test():
+            a, b = socket.socketpair()
+            reader, writer = await asyncio.open_connection(sock=a)
+
+            async def receive():
+                self.label.set_str((await reader.read(64)).decode())
+
+            task = asyncio.ensure_future(receive())
+            b.send(b'data')
+            await task
+            await asyncio.sleep(0.01)
+            self.assertEqual(self.line(), 'data')
+            writer.close()
+            b.close()
+
+        self.serve(test)
+
+    def test_awaited_callback(self):
+        loaded = asyncio.Event()
+
+        async def load():
+            self.label.set_str('loading')
+            await loaded.wait()
+            self.label.set_str('done')
+
+        button = gpx.WButton('load', keys=['l'], exe=load, locator=lambda x, y, w: (0, 1))
+        self.show(self.label, button)
+
+        async def test():
+            self.backend.feed('l')
+            await asyncio.sleep(0.01)
+            self.assertEqual(self.line(), 'loading')
+            loaded.set()
+            await asyncio.sleep(0.01)
+            self.assertEqual(self.line(), 'done')
+
+        self.serve(test)
+
+    def test_post(self):
+        self.show(self.label)
+
+        async def test():
+            t = threading.Thread(target=lambda: self.window.post(lambda: self.label.set_str('posted'), self.label))
+            t.start()
+            t.join()
+            await asyncio.sleep(0.01)
+            self.assertEqual(self.line(), 'posted')
+
+        self.serve(test)
+
+
+# the placeholder is shown until a page from an awaitable getter arrives
+class TestPagerAsync(AsyncCase):
+    def setUp(self):
+        super().setUp()
+        self.gates = collections.defaultdict(asyncio.Event)
+        self.started = []
+        self.cancelled = []
+
+    async def get(self, n):
+        self.started.append(n)
+        try:
+            await self.gates[n].wait()
+        except asyncio.CancelledError:
+            self.cancelled.append(n)
+            raise
+        return gpx.WLabel('page {:d}'.format(n))
+
+    async def arrive(self, *pages):
+        for i in pages:
+            self.gates[i].set()
+        await asyncio.sleep(0.01)
+        return self.line()
+
+    async def paging(self, pager):
+        self.assertEqual(self.line(), 'Loading...')
+        self.assertEqual(await self.arrive(0), 'page 0')
+        await self.arrive(1)
+        pager.page_next()
+        await asyncio.sleep(0.01)
+        self.assertEqual(self.line(), 'page 1')
+        pager.page_set(5)
+        await asyncio.sleep(0.01)
+        self.assertEqual(self.line(), 'Loading...')
+        self.assertEqual(await self.arrive(5), 'page 5')
+        self.assertEqual(self.started, [0, 1, 2, 5, 4, 6])
+        self.assertEqual(self.cancelled, [2])
+
+    # the requests wait for the loop
+    def test_before_serving(self):
+        self.open()
+        pager = gpx.WPager(self.get, size=10, prefetch=1)
+        self.interface = gpx.WInterface(None)
+        self.interface.widget_add(pager)
+        self.window.interface = self.interface
+        self.serve(lambda: self.paging(pager))
+
+    def test_while_serving(self):
+        self.show(self.label)
+
+        async def test():
+            pager = gpx.WPager(self.get, size=10, prefetch=1)
+            self.interface.widget_clear()
+            self.interface.widget_add(pager)
+            await asyncio.sleep(0.01)
+            await self.paging(pager)
+
+        self.serve(test)
+
+    # the page may arrive before the pager is on screen
+    def test_not_shown(self):
+        self.show(self.label)
+
+        async def test():
+            pager = gpx.WPager(self.get, size=10)
+            await self.arrive(0)
+            self.interface.widget_add(pager)
+            await asyncio.sleep(0.01)
+            self.assertEqual(self.line(), 'page 0')
+
+        self.serve(test)
+
+    def test_serve(self):
+        self.open()
+        pager = gpx.WPager(self.get, size=10)
+        self.interface = gpx.WInterface(None)
+        self.interface.widget_add(pager)
+        self.window.interface = self.interface
+        # the sync loop can't await the page
+        self.assertRaises(RuntimeError, self.frame)
+
+
+if __name__ == '__main__':
+    unittest.main()
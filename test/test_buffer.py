@@ -0,0 +1,43 @@
+import os
+import random
+import sys
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import pygraphicst.buffer as buffer
+from pygraphicst.backend import HeadlessBackend
+
+
+class TestBuffer(unittest.TestCase):
+    def test_wide_over_wide(self):
+        b = buffer.Buffer(10, 1)
+        b.put(7, 0, '世')
+        b.put(6, 0, '界')
+        self.assertEqual([c for c, _ in b._cells[0][5:10]], [' ', '界', '', ' ', ' '])
+
+    def test_wide_over_wide_shown(self):
+        b = buffer.Buffer(10, 1)
+        h = HeadlessBackend(10, 1)
+        b.put(3, 0, '界b')
+        b.flush(lambda y, x, text, style: h.write(x, y, text, style))
+        b.put(1, 0, 'a界')
+        b.flush(lambda y, x, text, style: h.write(x, y, text, style))
+        self.assertEqual(h.lines(), [' a界 b'])
+
+    # what the buffer thinks is shown must be what a terminal shows
+    def test_random_puts(self):
+        r = random.Random(5)
+        style = buffer.style(0, 1)
+        for _ in range(300):
+            b = buffer.Buffer(12, 1)
+            h = HeadlessBackend(12, 1)
+            for _ in range(6):
+                s = ''.join(r.choice('ab世界') for _ in range(r.randint(1, 5)))
+                b.put(r.randint(-3, 12), 0, s, r.choice((buffer.STYLE_DEFAULT, style)))
+                b.flush(lambda y, x, text, st: h.write(x, y, text, st))
+                self.assertEqual(h.cells[0], b._cells[0])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,73 @@
+import unittest
+
+from headless import HeadlessCase
+
+import pygraphicst as gpx
+import pygraphicst.buffer as buffer
+import pygraphicst.wcwidth as wcwidth
+
+STYLE = buffer.style(0, gpx.constants.Color.GREEN)
+
+
+class TestCanvas(HeadlessCase):
+    # draw in a canvas at (3, 2) of size 20 x 6 with its content starting at (1, 1)
+    def drawn(self, draw):
+        class W(gpx.Widget):
+            def on_draw(self):
+                draw(self.canvas.canvas(3, 2, 20, 6, 1, 1))
+
+        self.open()
+        self.show(W())
+        return self.backend
+
+    def test_runs_merged(self):
+        b = self.drawn(lambda c: c.draw_runs([(0, 0, 'ab', STYLE), (2, 0, 'cd', STYLE), (4, 0, 'ef', None)]))
+        self.assertEqual(b.lines()[3], '    abcdef')
+        self.assertEqual(b.cells[3][6], ('c', STYLE))
+        self.assertEqual(b.cells[3][8], ('e', buffer.STYLE_DEFAULT))
+
+    def test_runs_clipped(self):
+        runs = [(-2, 0, 'x世z', None), (15, 1, 'abcdefgh', None), (0, 5, 'below', None)]
+        b = self.drawn(lambda c: c.draw_runs(runs))
+        lines = b.lines()
+        # the wide char cut on the left edge leaves a blank
+        self.assertEqual(lines[3], '     z')
+        self.assertEqual(lines[4], ' ' * 19 + 'abcd')
+        self.assertEqual(lines[8], '')
+
+    # same screen as drawing each fitted cell with draw_str
+    def test_grid(self):
+        matrix = [['c{:d},{:d}'.format(r, c) if (r + c) % 3 else '世界{:d}'.format(r) for c in range(8)]
+                  for r in range(12)]
+        widths = [5, 7, 3, 6, 4, 8, 5, 6]
+
+        def cells(c):
+            for r, row in enumerate(matrix):
+                x = -2
+                for n, s in enumerate(row):
+                    s = wcwidth.slise(s, 0, widths[n])
+                    s += ' ' * (widths[n] - wcwidth.width(s))
+                    if 0 <= r - 1 < 5 and x < 19:
+                        t = wcwidth.slise(s, -x) if x < 0 else s
+                        c.draw_str(wcwidth.slise(t, 0, 19 - max(x, 0)), x_left=max(x, 0), y_top=r - 1,
+                                   wrap=False, style=STYLE)
+                    x += widths[n]
+
+        grid = self.drawn(lambda c: c.draw_grid(matrix, widths, STYLE, x_left=-2, y_top=-1))
+        self.assertEqual(grid.cells, self.drawn(cells).cells)
+
+    def test_grid_styles(self):
+        d = buffer.STYLE_DEFAULT
+        styles = [[STYLE, STYLE, d], [d, STYLE, STYLE]]
+        b = self.drawn(lambda c: c.draw_grid([['a', 'b', 'c'], ['d', 'e', 'f']], [2, 2, 2], styles))
+        self.assertEqual(b.lines()[3:5], ['    a b c', '    d e f'])
+        self.assertEqual([b.cells[3][i][1] for i in (4, 6, 8)], [STYLE, STYLE, d])
+        self.assertEqual([b.cells[4][i][1] for i in (4, 6, 8)], [d, STYLE, STYLE])
+
+    def test_grid_empty(self):
+        b = self.drawn(lambda c: (c.draw_grid([], [3, 3], []), c.draw_grid([['a', 'b']], [3, 3], [[]], y_top=9)))
+        self.assertEqual(b.lines(), [''] * 12)
+
+
+if __name__ == '__main__':
+    unittest.main()
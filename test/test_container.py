@@ -0,0 +1,105 @@
+import unittest
+
+from headless import HeadlessCase
+
+import pygraphicst as gpx
+
+
+class TestHotkeys(HeadlessCase):
+    def setUp(self):
+        self.log = []
+        self.open()
+        self.inner = gpx.WContainer(lambda x, y: (0, 2), lambda x, y: (30, 5))
+        self.one = self.button('one', ['1'], 0)
+        self.inner.widget_add(self.one)
+        self.two = self.button('two', ['2', '1'], 10)
+        self.text = gpx.WText(locator=lambda x, y: (0, 8), sizer=lambda x, y: (20, 2))
+        self.show(self.inner, self.two, self.text)
+        self.window.key_lsnr.append(lambda ch: self.log.append(('unhandled', ch)))
+
+    def button(self, text, keys, x):
+        return gpx.WButton(text, keys=keys, exe=lambda: self.log.append(text), locator=lambda x_, y, w: (x, 0))
+
+    def keys(self, *keys):
+        self.log.clear()
+        self.press(*keys)
+        return self.log
+
+    def test_order(self):
+        # the first added of the nested ones goes first
+        self.assertEqual(self.keys('1', '2', 'x'), ['one', 'two', ('unhandled', 'x')])
+
+    def test_focused_first(self):
+        self.interface.focus = self.text
+        self.assertEqual(self.keys('1', '2'), [])
+        self.assertEqual(self.text.lines, ('12',))
+
+    def test_keys_set(self):
+        self.keys('1')
+        self.one.keys = ['z']
+        self.assertEqual(self.keys('z', '1'), ['one', 'two'])
+        # keys can't be changed in place behind the index
+        self.assertRaises(AttributeError, lambda: self.one.keys.append('y'))
+
+    def test_nested_add(self):
+        self.keys('1')
+        self.inner.widget_add(self.button('three', ['3'], 20))
+        self.assertEqual(self.keys('3'), ['three'])
+        self.inner.widget_remove(self.one)
+        self.assertEqual(self.keys('1'), ['two'])
+
+
+# clicks go to the widgets under them as found in the grid, which has to follow their layout
+class TestMouse(HeadlessCase):
+    def setUp(self):
+        self.log = []
+        self.open(60, 12)
+        self.inner = gpx.WContainer(lambda x, y: (0, 2), lambda x, y: (x - 20, 5))
+        self.one = gpx.WButton('one', exe=lambda: self.log.append('one'))
+        self.inner.widget_add(self.one)
+        self.at = [20, 3]
+        self.two = gpx.WButton('two', exe=lambda: self.log.append('two'), locator=lambda x, y, w: tuple(self.at))
+        self.inner.widget_add(self.two)
+        self.show(self.inner)
+
+    def click(self, x, y):
+        self.log.clear()
+        self.backend.click(x, y, gpx.constants.Button.B1_PRESSED)
+        self.backend.click(x, y, gpx.constants.Button.B1_RELEASED)
+        self.press()
+        return self.log
+
+    def test_click(self):
+        self.assertEqual(self.click(1, 2), ['one'])
+        self.assertEqual(self.click(21, 5), ['two'])
+        self.assertEqual(self.click(30, 5), [])
+        self.assertIsNone(self.inner.focus)
+
+    def test_relayout(self):
+        self.click(21, 5)
+        self.at[:] = [2, 3]
+        self.two.relayout()
+        self.frame()
+        self.assertEqual(self.click(21, 5), [])
+        self.assertEqual(self.click(3, 5), ['two'])
+
+    # past the grid cell it was in before
+    def test_grow(self):
+        self.click(21, 5)
+        self.two.text = 'a longer text'
+        self.two.pos_x = 2 * self.two.width + 13
+        self.frame()
+        self.assertEqual(self.click(33, 5), ['two'])
+
+    def test_resize(self):
+        self.at[:] = [50, 3]
+        self.two.relayout()
+        self.frame()
+        self.assertEqual(self.click(51, 5), [])
+        self.backend.resize_to(80, 12)
+        self.press()
+        self.assertEqual(self.click(51, 5), ['two'])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,88 @@
+import collections
+import os
+import random
+import sys
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import pygraphicst.wcwidth as wcwidth
+from pygraphicst.document import Document
+
+# narrow, wide, combining and control chars
+CHARS = 'ab c世界́\x01'
+
+
+# control chars take no column
+def width(s):
+    return sum(max(w, 0) for w in wcwidth.widths(s))
+
+
+def index(s, x):
+    i, _ = wcwidth.index(s, x, True)
+    return i if i != -1 else len(s)
+
+
+# random edits on a document and on a list of lines must agree
+class TestDocument(unittest.TestCase):
+    def check(self, d, lines):
+        self.assertEqual(list(d), lines)
+        self.assertEqual(len(d), len(lines))
+        self.assertEqual(list(d.widths()), [width(i) for i in lines])
+        self.assertEqual([d.width(i) for i in range(len(lines))], [width(i) for i in lines])
+        self.assertEqual(d.max_width(), max(width(i) for i in lines))
+        self.assertEqual(+d._counts, collections.Counter(width(i) for i in lines))
+
+    def test_random(self):
+        r = random.Random(1)
+        lines = ['', 'hello', '世界 x', '\x01\x01']
+        d = Document(lines)
+        for step in range(3000):
+            n = r.randrange(len(lines))
+            s = lines[n]
+            op = r.random()
+            if op < 0.35:
+                x = r.randint(0, len(s))
+                t = ''.join(r.choice(CHARS) for _ in range(r.randint(0, 4)))
+                if r.random() < 0.1:
+                    t += '\n' + r.choice(CHARS)
+                d.insert(n, x, t)
+                lines[n:n + 1] = (s[:x] + t + s[x:]).split('\n')
+            elif op < 0.55 and len(s) > 0:
+                x = r.randrange(len(s))
+                k = r.randint(1, len(s) - x)
+                d.delete(n, x, k)
+                lines[n] = s[:x] + s[x + k:]
+            elif op < 0.7:
+                x = r.randint(0, len(s))
+                d.split(n, x)
+                lines[n:n + 1] = [s[:x], s[x:]]
+            elif op < 0.8 and n + 1 < len(lines):
+                d.join(n)
+                lines[n:n + 2] = [s + lines[n + 1]]
+            else:
+                for x in range(width(s) + 2):
+                    i = index(s, x)
+                    self.assertEqual(d.index(n, x), i, (s, x))
+                    self.assertEqual(d.column(n, i), width(s[:i]))
+            if step % 20 == 0:
+                self.check(d, lines)
+        self.check(d, lines)
+
+    # the gap sits right before zero width chars
+    def test_index_gap(self):
+        for s, x in (('\x01\x01', 0), ('a\x01b', 1), ('áb', 1)):
+            for g in range(len(s) + 1):
+                d = Document([s])
+                d.delete(0, g, 0)
+                self.assertEqual(d.index(0, x), index(s, x), (s, g))
+
+    def test_errors(self):
+        d = Document(['ab'])
+        self.assertRaises(IndexError, d.insert, 1, 0, 'x')
+        self.assertRaises(IndexError, d.join, 0)
+        self.assertRaises(IndexError, d.delete, 0, 1, 5)
+
+
+if __name__ == '__main__':
+    unittest.main()
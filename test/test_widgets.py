@@ -0,0 +1,201 @@
+import concurrent.futures
+import unittest
+
+from headless import HeadlessCase
+
+import pygraphicst as gpx
+
+K = gpx.constants.Key
+
+
+# a long column that builds each cell when read and counts the reads
+class Column:
+    def __init__(self, f, n=1000000):
+        self.f = f
+        self.n = n
+        self.reads = 0
+
+    def __len__(self):
+        return self.n
+
+    def __getitem__(self, i):
+        self.reads += 1
+        return self.f(i)
+
+
+class TestTable(HeadlessCase):
+    def setUp(self):
+        self.columns = [
+            Column(str), Column(lambda n: '名字{:d}'.format(n % 7)),
+            Column(lambda n: 'x' * (n % 13)), Column(lambda n: 'last')
+        ]
+        self.table = gpx.WTable(
+            self.columns, header=['id', 'name', 'xs', 'tail'],
+            locator=lambda x, y: (1, 1), sizer=lambda x, y: (24, 5))
+        self.show(self.table, x_size=30, y_size=8, focus=self.table)
+
+    def lines(self):
+        return [i.rstrip() for i in self.backend.lines()[1:6]]
+
+    def test_draw(self):
+        self.assertEqual(self.lines(), [
+            ' id name  xs  tail', ' 0  名字0     last', ' 1  名字1 x   last',
+            ' 2  名字2 xx  last', ' 3  名字3 xxx last'])
+        # only the rows on screen are read
+        self.assertTrue(all(c.reads <= 8 for c in self.columns))
+
+    def test_keys(self):
+        self.press(K.NPAGE, K.DOWN, K.RIGHT)
+        self.assertEqual((self.table.top, self.table.left), (5, 1))
+        self.assertEqual(self.lines(), [
+            ' name  xs       tail', ' 名字5 xxxxx    last', ' 名字6 xxxxxx   last',
+            ' 名字0 xxxxxxx  last', ' 名字1 xxxxxxxx last'])
+
+    def test_scroll_end(self):
+        self.table.scroll(10 ** 7)
+        self.window.flush()
+        self.assertEqual(self.table.top, 999996)
+        self.assertEqual(self.lines()[-1], ' 999999 名字0')
+        self.assertTrue(all(c.reads <= 16 for c in self.columns))
+
+    def test_lengths(self):
+        self.assertRaises(ValueError, gpx.WTable, self.columns, header=['id'])
+        self.assertRaises(ValueError, gpx.WTable, self.columns, widths=[1, 2, 3, 4, 5])
+        self.table.widths = [6, 6]
+        self.assertRaises(ValueError, self.table.refresh)
+
+
+class TestLog(HeadlessCase):
+    def setUp(self):
+        self.draws = 0
+
+        class Log(gpx.WLog):
+            def on_draw(log):
+                self.draws += 1
+                super().on_draw()
+
+        self.log = Log(capacity=50, sizer=lambda x, y: (12, 4))
+        self.show(self.log, x_size=20, y_size=6, focus=self.log)
+
+    def lines(self):
+        return self.frame()[:4]
+
+    def press(self, key):
+        return super().press(key)[:4]
+
+    def test_bounded(self):
+        self.lines()
+        draws = self.draws
+        for n in range(100):
+            self.log.append('line {:d}{}'.format(n, ' long tail' if n % 10 == 0 else ''))
+        # appends before the posts run are drawn once
+        self.window._drain()
+        self.assertEqual(self.draws, draws + 1)
+        self.assertEqual(self.lines(), ['line 96', 'line 97', 'line 98', 'line 99'])
+        self.assertEqual(len(self.log.lines), 50)
+
+    def test_wrap(self):
+        self.log.extend(['short', 'line 90 long tail'])
+        self.assertEqual(self.lines(), ['short', 'line 90 long', ' tail', ''])
+
+    def test_follow(self):
+        self.log.extend('line {:d}'.format(n) for n in range(20))
+        self.lines()
+        self.press(K.UP)
+        self.assertEqual(self.press(K.UP), ['line 14', 'line 15', 'line 16', 'line 17'])
+        self.assertFalse(self.log.following)
+        # new lines keep a scrolled view in place
+        self.log.append('new')
+        self.assertEqual(self.lines(), ['line 14', 'line 15', 'line 16', 'line 17'])
+        self.assertEqual(self.press(K.END), ['line 17', 'line 18', 'line 19', 'new'])
+        self.assertTrue(self.log.following)
+        self.assertEqual(self.press(K.HOME), ['line 0', 'line 1', 'line 2', 'line 3'])
+
+    # a log outlives its window
+    def test_closed(self):
+        self.log.append('line')
+        self.lines()
+        self.close()
+        self.log.append('after')
+        self.log.scroll(1)
+        self.log.clear()
+        self.assertEqual(len(self.log.lines), 0)
+
+
+# runs a request only when the test says so
+class Manual(concurrent.futures.Executor):
+    def __init__(self):
+        self.requests = {}
+
+    def submit(self, fn, *args, **kwargs):
+        f = concurrent.futures.Future()
+        self.requests[args[0]] = (f, lambda: fn(*args, **kwargs))
+        return f
+
+    def run(self, n):
+        f, g = self.requests[n]
+        if f.set_running_or_notify_cancel():
+            f.set_result(g())
+
+
+class TestPager(HeadlessCase):
+    def setUp(self):
+        self.got = []
+        self.executor = Manual()
+        self.open()
+        self.pager = gpx.WPager(self.get, size=100, capacity=2, prefetch=1, executor=self.executor)
+        self.show(self.pager)
+
+    def get(self, n):
+        self.got.append(n)
+        return gpx.WLabel('page {:d}'.format(n))
+
+    def line(self):
+        return self.frame()[0]
+
+    def test_prefetch(self):
+        self.assertEqual(list(self.executor.requests), [1])
+        self.executor.run(1)
+        self.line()
+        for n in range(1, 6):
+            self.pager.page_next()
+            # the page was there before it was asked for
+            self.assertEqual(self.line(), 'page {:d}'.format(n))
+            self.executor.run(n + 1)
+            self.line()
+            # capacity grows to keep the pages around the current one
+            self.assertEqual(sorted(self.pager.buffer), [n - 1, n, n + 1])
+        self.assertEqual(self.got, list(range(7)))
+
+    def test_stale(self):
+        self.pager.page_set(10)
+        self.assertEqual(self.line(), 'page 10')
+        f, _ = self.executor.requests[1]
+        self.assertTrue(f.cancelled())
+        self.assertEqual(sorted(self.pager._pending), [9, 11])
+        self.executor.run(1)
+        self.executor.run(9)
+        self.line()
+        self.assertNotIn(1, self.pager.buffer)
+        self.assertIn(9, self.pager.buffer)
+        self.assertEqual(self.got, [0, 10, 9])
+
+    def test_unbuffered(self):
+        self.executor.run(1)
+        self.line()
+        self.pager.buffered = False
+        self.pager.page_set(50)
+        self.executor.run(49)
+        self.executor.run(51)
+        self.line()
+        self.pager.page_next()
+        self.assertEqual(self.line(), 'page 51')
+        # only the prefetched neighbours are kept
+        self.assertEqual(sorted(self.pager.buffer), [])
+        self.executor.run(52)
+        self.line()
+        self.assertEqual(sorted(self.pager.buffer), [52])
+
+
+if __name__ == '__main__':
+    unittest.main()